@@ -1,144 +1,641 @@
+import functools
+import gc
+import hashlib
+import inspect
+import json
 import os
-from dash import Dash, dcc, html, Input, Output
+import sys
+from flask import Response, jsonify, request
+from dash import Dash, ctx, dcc, html, no_update, Input, Output, State
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
 
-# Cargar los datos
-ruta_base = "./data"
-results = pd.read_csv(f"{ruta_base}/results.csv")
-drivers = pd.read_csv(f"{ruta_base}/drivers.csv")
-races = pd.read_csv(f"{ruta_base}/races.csv")
-constructors = pd.read_csv(f"{ruta_base}/constructors.csv")
-constructor_results = pd.read_csv(f"{ruta_base}/constructor_results.csv")
-lap_times = pd.read_csv(f"{ruta_base}/lap_times.csv")
-pit_stops = pd.read_csv(f"{ruta_base}/pit_stops.csv")
-circuits = pd.read_csv(f"{ruta_base}/circuits.csv")
-
-# Preparar los datos
-results_cleaned = results.merge(drivers, on="driverId").merge(races, on="raceId")
-results_cleaned = results_cleaned[(results_cleaned["grid"] > 0) & (results_cleaned["positionOrder"] > 0)]
-
-constructor_results_teams = constructor_results.merge(constructors[["constructorId", "name"]], on="constructorId", how="inner")
-results_teams = constructor_results_teams.merge(races[["raceId", "year"]], on="raceId", how="inner")
-results_drivers_races = results.merge(drivers, on="driverId").merge(races, on="raceId")
-
-# Función para convertir milisegundos a formato "min:seg,ms"
-def format_time(milliseconds):
-    minutes = milliseconds // 60000
-    seconds = (milliseconds % 60000) // 1000
-    millis = milliseconds % 1000
-    return f"{minutes}:{seconds:02d},{millis:03d}"
+from background import background_manager, deduplicated
+from compact import to_compact_json, year_patch
+from best_laps import BestLapIndex, race_best_laps
+from constructor_matrix import ConstructorSeasonMatrix
+from data_store import DataRegistry, MissingTableError, concat_rows, data_version
+from figure_cache import FigureCache
+from grid_finish import GridFinishHistogram
+from qualifying import SESSIONS, QualifyingIndex
+from head_to_head import HeadToHeadIndex
+from metrics import CallbackMetrics
+from season_cache import SeasonCache, final_round_rows, points_evolution_by_year
+from static_bundles import dash_update_request, figures_response
+from strategy import PitStrategyIndex
+from timefmt import format_milliseconds
+
+# Registro de datos: cada tabla se carga (desde el almacén Arrow) la primera
+# vez que un callback la necesita (F1_DATA_DIR permite apuntar a otro directorio)
+ruta_base = os.environ.get("F1_DATA_DIR", "./data")
+registry = DataRegistry(ruta_base)
+
+# Preparar los datos (tablas derivadas, también bajo demanda). results_cleaned
+# sólo guarda las columnas que usan los callbacks; el nombre del piloto se
+# resuelve al pintar con driver_labels. Se ordena por (year, raceId) para que
+# cada temporada, o rango de temporadas, sea un tramo contiguo de filas
+RESULTS_COLUMNS = ["raceId", "driverId", "constructorId", "grid", "positionOrder", "points"]
+
+def prepare_results(results, races):
+    results_cleaned = results.loc[(results["grid"] > 0) & (results["positionOrder"] > 0), RESULTS_COLUMNS]
+    results_cleaned = results_cleaned.merge(races[["raceId", "year"]], on="raceId")
+    return results_cleaned.sort_values(by=["year", "raceId"], kind="stable").reset_index(drop=True)
+
+@registry.derived("results_cleaned")
+def build_results_cleaned(registry):
+    return prepare_results(registry.get("results"), registry.get("races"))
+
+# Ingesta incremental: sólo se preparan (merge) las filas nuevas
+@registry.appender("results_cleaned")
+def append_results_cleaned(registry, results_cleaned, batch):
+    if "results" not in batch.tables:
+        return results_cleaned
+    new_rows = prepare_results(batch.tables["results"], registry.get("races"))
+    if new_rows.empty:
+        return results_cleaned
+    # Lo normal es que las carreras nuevas sean las más recientes y basta con
+    # añadirlas al final; si no, se reordena para mantener las temporadas contiguas
+    in_order = results_cleaned.empty or (
+        tuple(new_rows[["year", "raceId"]].iloc[0]) >= tuple(results_cleaned[["year", "raceId"]].iloc[-1])
+    )
+    results_cleaned = concat_rows(results_cleaned, new_rows)
+    if not in_order:
+        results_cleaned = results_cleaned.sort_values(by=["year", "raceId"], kind="stable").reset_index(drop=True)
+    return results_cleaned
+
+# Dimensión driverId -> nombre para las etiquetas de los gráficos
+@registry.derived("driver_names")
+def build_driver_names(registry):
+    return registry.get("drivers").set_index("driverId")[["forename", "surname", "driverRef"]]
+
+# Puntos y posición final de cada equipo en cada temporada (matriz densa). Es
+# pequeña y se reconstruye bajo demanda tras una ingesta
+@registry.derived("constructor_matrix")
+def build_constructor_matrix(registry):
+    standings = registry.get("constructor_standings") if registry.available("constructor_standings") else None
+    return ConstructorSeasonMatrix(registry.get("constructor_results"), registry.get("races"), standings)
+
+@registry.derived("constructor_names")
+def build_constructor_names(registry):
+    return registry.get("constructors").set_index("constructorId")["name"].astype(str)
+
+# Número de paradas por (raceId, driverId), indexado para búsquedas directas
+@registry.derived("pit_stop_counts")
+def build_pit_stop_counts(registry):
+    return registry.get("pit_stops").groupby(["raceId", "driverId"]).size().rename("num_pit_stops").sort_index()
+
+@registry.appender("pit_stop_counts")
+def append_pit_stop_counts(registry, pit_stop_counts, batch):
+    if "pit_stops" not in batch.tables:
+        return pit_stop_counts
+    new_counts = batch.tables["pit_stops"].groupby(["raceId", "driverId"]).size().rename("num_pit_stops")
+    return pd.concat([pit_stop_counts, new_counts]).sort_index()
+
+# Índice (temporada, carrera) -> mejores vueltas por piloto. Sin lap_times.csv
+# se usa la vuelta rápida de results
+def best_lap_source(registry):
+    if registry.available("lap_times"):
+        return "lap_times"
+    return "results"
+
+def source_best_laps(source, table):
+    return race_best_laps(lap_times=table) if source == "lap_times" else race_best_laps(results=table)
+
+@registry.derived("best_lap_index")
+def build_best_lap_index(registry):
+    source = best_lap_source(registry)
+    return BestLapIndex(source_best_laps(source, registry.get(source)), registry.get("races"), source)
+
+@registry.appender("best_lap_index")
+def append_best_lap_index(registry, best_lap_index, batch):
+    if best_lap_index.source not in batch.tables:
+        return best_lap_index
+    new_laps = source_best_laps(best_lap_index.source, batch.tables[best_lap_index.source])
+    return best_lap_index.add(new_laps, registry.get("races"))
+
+# Estrategia de paradas de cada carrera (stints, tiempos de parada y, con
+# lap_times, intentos de undercut). Una ingesta sólo calcula las carreras nuevas
+@registry.derived("pit_strategy")
+def build_pit_strategy(registry):
+    lap_times = registry.get("lap_times") if registry.available("lap_times") else None
+    return PitStrategyIndex(registry.get("pit_stops"), registry.get("results"), lap_times)
+
+@registry.appender("pit_strategy")
+def append_pit_strategy(registry, pit_strategy, batch):
+    if "pit_stops" not in batch.tables:
+        return pit_strategy
+    lap_times = registry.get("lap_times") if pit_strategy.has_positions else None
+    return pit_strategy.add(batch.tables["pit_stops"], registry.get("results"), lap_times)
+
+# Duelos entre pilotos: estadísticas por pareja y temporada (tabla dispersa)
+# con un LRU de los duelos consultados
+@registry.derived("head_to_head")
+def build_head_to_head(registry):
+    qualifying = registry.get("qualifying") if registry.available("qualifying") else None
+    return HeadToHeadIndex(registry.get("results"), registry.get("races"), qualifying)
+
+@registry.appender("head_to_head")
+def append_head_to_head(registry, head_to_head, batch):
+    if "results" not in batch.tables and "qualifying" not in batch.tables:
+        return head_to_head
+    results = batch.tables.get("results", registry.get("results").iloc[0:0])
+    return head_to_head.add(results, registry.get("races"), batch.tables.get("qualifying"))
+
+# Campeón de cada temporada: líder de driver_standings tras la última carrera
+# del calendario (por driverId, no por apellido: hay varios Schumacher/Hill).
+# Las temporadas sin clasificación de su última carrera (en curso o con los
+# datos incompletos) no tienen campeón
+@registry.derived("champions")
+def build_champions(registry):
+    races = registry.get("races")
+    standings = registry.get("driver_standings").merge(races[["raceId", "year", "round"]], on="raceId")
+    final_round = final_round_rows(standings, races)
+    champions = standings.loc[final_round & (standings["position"] == 1), ["year", "driverId", "points"]]
+    return champions.sort_values(by="year").reset_index(drop=True)
+
+@registry.derived("titles_by_driver")
+def build_titles_by_driver(registry):
+    titles = registry.get("champions").groupby("driverId").size().rename("titles").reset_index()
+    drivers = registry.get("drivers")
+    titles = titles.merge(drivers[["driverId", "forename", "surname"]], on="driverId")
+    titles["driver"] = titles["forename"] + " " + titles["surname"].astype(str)
+    return titles.sort_values(by=["titles", "surname"], ascending=[False, True])[["driverId", "driver", "titles"]]
+
+# Puntos acumulados por ronda de cada temporada (matriz rondas x pilotos)
+# calculados una sola vez desde driver_standings, que incluye las sprint
+@registry.derived("points_evolution")
+def build_points_evolution(registry):
+    return points_evolution_by_year(registry.get("driver_standings"), registry.get("races"))
+
+# Tras una ingesta sólo se recalculan las temporadas afectadas
+@registry.appender("points_evolution")
+def append_points_evolution(registry, points_evolution, batch):
+    if "driver_standings" not in batch.tables:
+        return points_evolution
+    races = registry.get("races")
+    race_ids = races.loc[races["year"].isin(batch.years), "raceId"]
+    standings = registry.get("driver_standings")
+    return {**points_evolution, **points_evolution_by_year(standings[standings["raceId"].isin(race_ids)], races)}
+
+# Tiempos de clasificación en arrays compactos ordenados por (año, ronda). Es
+# pequeño y se reconstruye bajo demanda tras una ingesta
+@registry.derived("qualifying_index")
+def build_qualifying_index(registry):
+    return QualifyingIndex(registry.get("qualifying"), registry.get("races"))
+
+# Histograma salida x llegada por temporada para la vista de varias
+# temporadas del gráfico 3 (se reconstruye bajo demanda tras una ingesta)
+@registry.derived("grid_finish_histogram")
+def build_grid_finish_histogram(registry):
+    return GridFinishHistogram(registry.get("results_cleaned"))
+
+# Agregados por temporada compartidos por todos los callbacks (LRU acotado)
+@registry.derived("season_cache")
+def build_season_cache(registry):
+    return SeasonCache(registry.get("results_cleaned"), maxsize=int(os.environ.get("F1_SEASON_CACHE_SIZE", 16)))
+
+@registry.appender("season_cache")
+def append_season_cache(registry, season_cache, batch):
+    return season_cache.extend(registry.get("results_cleaned"), batch.years)
+
+# Modo compacto (F1_COMPACT_FIGURES=1): una sola traza con un color por barra,
+# typed arrays en el JSON, ancho adaptable y parches al cambiar de año
+COMPACT_FIGURES = os.environ.get("F1_COMPACT_FIGURES", "0") == "1"
+
+# Precarga para gunicorn --preload (F1_PRELOAD=1, ver gunicorn.conf.py): el
+# proceso maestro construye todas las tablas antes de crear los workers, que
+# las comparten por copy-on-write. Las columnas numéricas de las tablas base
+# ya son vistas de sólo lectura del almacén Arrow mapeado en memoria. El
+# recolector se desactiva durante la carga y, al terminar (también si falla),
+# los objetos precargados pasan a la generación permanente con gc.freeze() y
+# el recolector vuelve a su estado anterior: no recorre (ni copia) sus páginas
+# aunque no haya hooks de gunicorn que lo hagan.
+def preload():
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        missing = registry.preload()
+        # Las temporadas más recientes también quedan en el LRU compartido
+        season_cache = registry.get("season_cache")
+        for year in season_cache.years()[-season_cache.maxsize:]:
+            season_cache.get(year)
+    finally:
+        gc.freeze()
+        if was_enabled:
+            gc.enable()
+    return missing
+
+# Caché de figuras serializadas; la clave incluye la versión de los datos y
+# del código de los gráficos (F1_FIGURE_CACHE_DIR activa el backend en disco).
+# El código es app.py y los módulos del proyecto que importa, directa o
+# indirectamente (agregados, índices, formato de tiempos, modo compacto...)
+def project_modules(module, raiz, found):
+    for value in list(vars(module).values()):
+        name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+        imported = sys.modules.get(name) if isinstance(name, str) else None
+        path = getattr(imported, "__file__", None)
+        path = path and os.path.abspath(path)
+        if path and os.path.dirname(path) == raiz and path not in found:
+            found.add(path)
+            project_modules(imported, raiz, found)
+    return found
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    paths = project_modules(sys.modules[__name__], raiz, {os.path.abspath(__file__)})
+    firma = hashlib.sha1()
+    for path in sorted(paths, key=os.path.basename):
+        with open(path, "rb") as f:
+            firma.update(os.path.basename(path).encode() + b"\0" + f.read())
+    return firma.hexdigest()[:8]
+
+def figure_version(data_version):
+    return f"{data_version}-{code_version()}" + ("-compact" if COMPACT_FIGURES else "")
+
+@registry.derived("figure_cache")
+def build_figure_cache(registry):
+    return FigureCache(
+        version=figure_version(data_version(registry.ruta_base)),
+        maxsize=int(os.environ.get("F1_FIGURE_CACHE_SIZE", 256)),
+        directory=os.environ.get("F1_FIGURE_CACHE_DIR"),
+        disk_maxsize=int(os.environ.get("F1_FIGURE_CACHE_DISK_SIZE", 10000)),
+    )
+
+# Tras una ingesta sólo se invalidan las figuras de las temporadas afectadas
+@registry.appender("figure_cache")
+def append_figure_cache(registry, figure_cache, batch):
+    return figure_cache.rebase(figure_version(batch.data_version), batch.years)
+
+def season(selected_year):
+    return registry.get("season_cache").get(selected_year)
+
+# Tiempos por fase de cada callback, expuestos en /metrics. Con F1_PROFILE_DIR
+# se guarda además un perfil cProfile de cada petición en ese directorio
+metrics = CallbackMetrics(profile_dir=os.environ.get("F1_PROFILE_DIR"))
+phase = metrics.phase
+
+# Apellido de cada piloto para las etiquetas. Si dos pilotos distintos del
+# gráfico comparten apellido (Schumacher, Verstappen...) se antepone la
+# inicial; si aún coinciden (Michael y Mick Schumacher), el nombre completo, y
+# en último caso se añade el driverRef, que es único
+def driver_labels(driver_ids):
+    unique_ids = pd.unique(np.asarray(driver_ids))
+    names = registry.get("driver_names").reindex(unique_ids)
+    surnames = names["surname"].astype(str)
+    labels = surnames
+    for fallback in (
+        names["forename"].str[0] + ". " + surnames,
+        names["forename"] + " " + surnames,
+        names["forename"] + " " + surnames + " (" + names["driverRef"] + ")",
+    ):
+        labels = labels.where(~labels.duplicated(keep=False), fallback)
+    return pd.Series(labels.to_numpy(), index=unique_ids).reindex(driver_ids).to_numpy()
+
+# Carreras (por nombre) disputadas en una temporada
+def season_circuits(selected_year):
+    races = registry.get("races")
+    return [str(name) for name in races.loc[races["year"] == selected_year, "name"].unique()]
+
+# Barras coloreadas por categoría: en modo compacto una sola traza con el
+# color de cada barra en lugar de una traza (y una entrada de leyenda) por fila
+def colored_bar(data, color, palette, **kwargs):
+    if not COMPACT_FIGURES:
+        if color == "driverId":
+            return driver_traces(px.bar, data, palette, **kwargs)
+        return px.bar(data, color=color, color_discrete_sequence=palette, **kwargs)
+    fig = px.bar(data, **kwargs)
+    fig.update_traces(marker_color=[palette[i % len(palette)] for i in range(len(data))])
+    return fig
+
+# Una traza por piloto agrupada por driverId (nunca por la etiqueta, así dos
+# pilotos no comparten traza) con su nombre en la leyenda
+def driver_traces(plot, data, palette, **kwargs):
+    data = data.assign(driver_key=data["driverId"].astype(str))
+    fig = plot(
+        data, color="driver_key", color_discrete_sequence=palette,
+        hover_data={"driver_key": False, **kwargs.pop("hover_data", {})}, **kwargs
+    )
+    names = dict(zip(data["driver_key"], driver_labels(data["driverId"])))
+    fig.for_each_trace(lambda trace: trace.update(name=names[trace.name], legendgroup=names[trace.name]))
+    fig.update_layout(legend_title_text="Piloto")
+    return fig
+
+# Ancho fijo de los gráficos anchos; en modo compacto se adapta a la ventana
+def layout_width():
+    return None if COMPACT_FIGURES else 1850
+
+# Figura vacía con un aviso en lugar del gráfico
+def notice_figure(text):
+    fig = go.Figure()
+    fig.add_annotation(
+        text=text,
+        showarrow=False, font={"size": 16},
+        xref="paper", yref="paper", x=0.5, y=0.5,
+    )
+    fig.update_layout(xaxis={"visible": False}, yaxis={"visible": False})
+    return fig
+
+# Aviso que sustituye a un gráfico cuando falta su tabla de origen
+def missing_data_figure(error):
+    return notice_figure(f"Datos no disponibles: falta {error.name}.csv")
+
+# Los callbacks que dependen de una tabla ausente degradan a un aviso en lugar
+# de tumbar la aplicación
+def degrade_on_missing(callback):
+    @functools.wraps(callback)
+    def wrapper(*args):
+        try:
+            return callback(*args)
+        except MissingTableError as error:
+            return missing_data_figure(error)
+    return wrapper
 
 # Crear la aplicación Dash
 app = Dash(__name__)
 
-# Layout de la aplicación
-app.layout = html.Div([
-    html.H1("Análisis de Fórmula 1", style={"textAlign": "center"}),
-
-    # Selector de Año
-    html.Label("Selecciona el Año:"),
-    dcc.Dropdown(
-        id="year-selector",
-        options=sorted([{"label": year, "value": year} for year in results_cleaned["year"].unique()], key=lambda x: x["value"]),
-        value=2021,
-        clearable=False
-    ),
-
-    # Selector de Circuito
-    html.Label("Selecciona el Circuito:"),
-    dcc.Dropdown(
-        id="circuit-selector",
-        options=[{"label": name, "value": name} for name in races["name"].unique()],
-        value=None,
-        placeholder="Selecciona un circuito"
-    ),
-
-    # Gráficos
-    html.Div([
-        html.H2("1. Rendimiento de Pilotos por Temporadas"),
-        dcc.Graph(id="pilot-performance"),
-    ]),
-
-    html.Div([
-        html.H2("2. Consistencia de Pilotos Durante una Temporada"),
-        dcc.Graph(id="pilot-consistency"),
-    ]),
-
-    html.Div([
-        html.H2("3. Impacto de la Clasificación en los Resultados Finales"),
-        dcc.Graph(id="classification-impact"),
-    ]),
-
-    html.Div([
-        html.H2("4. Impacto de las Paradas en Boxes"),
-        dcc.Graph(id="pitstop-impact"),
-    ]),
-
-    html.Div([
-        html.H2("5. Rendimiento de Equipos por Temporada"),
-        dcc.Graph(id="team-performance"),
-    ]),
-
-    html.Div([
-        html.H2("6. Evolución de los Puntos de los Pilotos por Carrera"),
-        dcc.Graph(id="race-points-evolution"),
-    ]),
-
-    html.Div([
-        html.H2("7. Mejores Tiempos por Vuelta"),
-        dcc.Graph(id="best-lap-times"),
-    ]),
-
-    html.Div([
-        html.H2("8. Circuitos en el Mapa"),
-        dcc.Graph(id="circuit-map"),
-    ]),
-
-    html.Div([
-        html.H2("9. Distribución de Puntos por Piloto"),
-        dcc.Graph(id="points-pie-chart"),
-    ]),
-
-    html.Div([
-        html.H2("10. Títulos de Pilotos"),
-        dcc.Graph(id="titles-bar-chart"),
-    ]),
-])
+# Cada petición comprueba (con un stat) si hay ingestas nuevas que aplicar
+@app.server.before_request
+def refresh_data():
+    registry.refresh()
+
+# Métricas de los callbacks de este worker (cada worker de gunicorn tiene las suyas)
+@app.server.route("/metrics")
+def metrics_endpoint():
+    snapshot = metrics.snapshot()
+    if "figure_cache" in registry.loaded():
+        figure_cache = registry.get("figure_cache")
+        snapshot["figure_cache"] = {"hits": figure_cache.hits, "misses": figure_cache.misses}
+    return jsonify(snapshot)
+
+DEFAULT_YEAR = 2021
+
+# Layout de la aplicación (las opciones se calculan en la primera visita, no al importar)
+def build_layout(year_options, circuit_options, driver_options=(), constructor_options=()):
+    years = [option["value"] for option in year_options]
+    first_year, last_year = year_bounds(years)
+    return html.Div([
+        html.H1("Análisis de Fórmula 1", style={"textAlign": "center"}),
+
+        # Selector de Año
+        html.Label("Selecciona el Año:"),
+        dcc.Dropdown(
+            id="year-selector",
+            options=year_options,
+            value=DEFAULT_YEAR,
+            clearable=False
+        ),
+
+        # Selector de Circuito
+        html.Label("Selecciona el Circuito:"),
+        dcc.Dropdown(
+            id="circuit-selector",
+            options=circuit_options,
+            value=None,
+            placeholder="Selecciona un circuito"
+        ),
+
+        # Gráficos
+        html.Div([
+            html.H2("1. Rendimiento de Pilotos por Temporadas"),
+            dcc.Graph(id="pilot-performance"),
+        ]),
+
+        html.Div([
+            html.H2("2. Consistencia de Pilotos Durante una Temporada"),
+            dcc.Graph(id="pilot-consistency"),
+        ]),
+
+        html.Div([
+            html.H2("3. Impacto de la Clasificación en los Resultados Finales"),
+            dcc.RadioItems(
+                id="classification-scope",
+                options=[
+                    {"label": "Temporada seleccionada", "value": "season"},
+                    {"label": "Toda la historia", "value": "all"},
+                ],
+                value="season",
+                inline=True
+            ),
+            html.Div(dcc.Graph(id="classification-impact"), id="classification-season-view"),
+            html.Div([
+                html.Div(id="classification-impact-all-progress"),
+                dcc.Graph(id="classification-impact-all"),
+            ], id="classification-all-view", style={"display": "none"}),
+        ]),
+
+        html.Div([
+            html.H2("4. Impacto de las Paradas en Boxes"),
+            dcc.Graph(id="pitstop-impact"),
+        ]),
+
+        html.Div([
+            html.H2("5. Rendimiento de Equipos por Temporada"),
+            dcc.RadioItems(
+                id="team-scope",
+                options=[
+                    {"label": "Temporada seleccionada", "value": "season"},
+                    {"label": "Todas las épocas", "value": "all"},
+                ],
+                value="season",
+                inline=True
+            ),
+            dcc.Graph(id="team-performance"),
+        ]),
+
+        html.Div([
+            html.H2("6. Evolución de los Puntos de los Pilotos por Carrera"),
+            dcc.Graph(id="race-points-evolution"),
+        ]),
+
+        html.Div([
+            html.H2("7. Mejores Tiempos por Vuelta"),
+            dcc.Graph(id="best-lap-times"),
+        ]),
+
+        html.Div([
+            html.H2("8. Circuitos en el Mapa"),
+            dcc.Graph(id="circuit-map"),
+        ]),
+
+        html.Div([
+            html.H2("9. Distribución de Puntos por Piloto"),
+            dcc.Graph(id="points-pie-chart"),
+        ]),
+
+        html.Div([
+            html.H2("10. Títulos de Pilotos"),
+            dcc.Graph(id="titles-bar-chart"),
+        ]),
+
+        html.Div([
+            html.H2("11. Puntos por Temporada en un Rango de Años"),
+            dcc.RangeSlider(
+                id="year-range",
+                min=first_year, max=last_year, step=1,
+                value=default_year_range(years),
+                marks={year: str(year) for year in range(first_year - first_year % 10 + 10, last_year + 1, 10)},
+                tooltip={"placement": "bottom"}
+            ),
+            html.Label("Pilotos (por defecto, los 10 con más puntos del rango):"),
+            dcc.Dropdown(id="driver-selector", options=list(driver_options), multi=True),
+            html.Label("Equipos:"),
+            dcc.Dropdown(id="constructor-selector", options=list(constructor_options), multi=True),
+            html.Div(id="range-points-progress"),
+            dcc.Graph(id="range-points"),
+        ]),
+
+        html.Div([
+            html.H2("12. Diferencias en Clasificación"),
+            dcc.RadioItems(
+                id="qualifying-view",
+                options=[
+                    {"label": "Diferencia con la pole", "value": "pole"},
+                    {"label": "Diferencia con el compañero", "value": "teammates"},
+                    {"label": "Evolución entre sesiones", "value": "sessions"},
+                ],
+                value="pole",
+                inline=True
+            ),
+            dcc.Graph(id="qualifying-gaps"),
+        ]),
+
+        html.Div([
+            html.H2("13. Estrategia de Paradas por Carrera"),
+            html.Label("Carrera (por defecto, la primera de la temporada con paradas registradas):"),
+            dcc.Dropdown(id="strategy-race", options=circuit_options, value=None),
+            dcc.RadioItems(
+                id="strategy-view",
+                options=[
+                    {"label": "Stints", "value": "stints"},
+                    {"label": "Tiempo de parada", "value": "stops"},
+                    {"label": "Undercuts", "value": "undercuts"},
+                ],
+                value="stints",
+                inline=True
+            ),
+            dcc.Graph(id="pit-strategy"),
+        ]),
+
+        html.Div([
+            html.H2("14. Duelo entre Pilotos"),
+            html.Label("Pilotos (por defecto, los dos primeros de la temporada):"),
+            dcc.Dropdown(id="h2h-driver-a", options=list(driver_options)),
+            dcc.Dropdown(id="h2h-driver-b", options=list(driver_options)),
+            dcc.RadioItems(
+                id="h2h-scope",
+                options=[
+                    {"label": "Temporada seleccionada", "value": "season"},
+                    {"label": "Toda la historia", "value": "all"},
+                ],
+                value="season",
+                inline=True
+            ),
+            dcc.Graph(id="head-to-head"),
+        ]),
+    ])
+
+# Límites del selector de rango a partir de las temporadas disponibles
+def year_bounds(years):
+    return (min(years), max(years)) if years else (1950, 2024)
+
+# Rango inicial: las últimas doce temporadas
+def default_year_range(years):
+    first_year, last_year = year_bounds(years)
+    return [max(first_year, last_year - 11), last_year]
+
+def serve_layout():
+    return build_layout(
+        [{"label": year, "value": year} for year in registry.get("season_cache").years()],
+        [{"label": name, "value": name} for name in season_circuits(DEFAULT_YEAR)],
+        selector_options(driver_full_names()),
+        selector_options(registry.get("constructor_names")),
+    )
+
+def driver_full_names():
+    names = registry.get("driver_names")
+    return names["forename"] + " " + names["surname"].astype(str)
+
+# Opciones id -> nombre de un selector múltiple, ordenadas por nombre
+def selector_options(names):
+    return [{"label": name, "value": int(item_id)} for item_id, name in names.sort_values().items()]
+
+# Dash valida los layouts dinámicos llamándolos al asignarlos; el esqueleto sin
+# opciones evita que esa validación cargue los datos al importar
+app.validation_layout = build_layout([], [])
+app.layout = serve_layout
 
 # Callbacks
+# Cada gráfico se declara con graph_callback y se registra más abajo, bien como
+# un callback independiente o bien agrupado en un único callback por año
+
+GRAPH_CALLBACKS = []
+# Gráficos pesados que se pueden ejecutar en segundo plano
+HEAVY_GRAPHS = set()
+# Gráficos que no dependen del año (siempre o según sus otros selectores): se
+# guardan una sola vez en la caché, con año None
+ALL_TIME_GRAPHS = {}
+
+# Valores de cada selector adicional que hay que precalcular para un año
+INPUT_CHOICES = {
+    "circuit-selector": lambda year: [None] + season_circuits(year),
+    "classification-scope": lambda year: ["season", "all"],
+    "year-range": lambda year: [default_year_range(registry.get("season_cache").years())],
+    "driver-selector": lambda year: [None],
+    "constructor-selector": lambda year: [None],
+    "team-scope": lambda year: ["season", "all"],
+    "qualifying-view": lambda year: ["pole", "teammates", "sessions"],
+    "strategy-race": lambda year: [None] + season_circuits(year),
+    "strategy-view": lambda year: ["stints", "stops", "undercuts"],
+    "h2h-driver-a": lambda year: [None],
+    "h2h-driver-b": lambda year: [None],
+    "h2h-scope": lambda year: ["season", "all"],
+}
+
+def always_all_time(*values):
+    return True
+
+def graph_callback(graph_id, inputs=(), per_season=True, all_time_when=None, heavy=False):
+    def register(callback):
+        GRAPH_CALLBACKS.append((graph_id, callback, tuple(inputs)))
+        if heavy:
+            HEAVY_GRAPHS.add(graph_id)
+        if not per_season:
+            ALL_TIME_GRAPHS[graph_id] = always_all_time
+        elif all_time_when is not None:
+            ALL_TIME_GRAPHS[graph_id] = all_time_when
+        return callback
+    return register
 
 ## 1. Rendimiento de Pilotos
-@app.callback(
-    Output("pilot-performance", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("pilot-performance")
 def update_pilot_performance(selected_year):
-    filtered_data = results_cleaned[results_cleaned["year"] == selected_year]
-    points_by_driver = filtered_data.groupby("surname")["points"].sum().reset_index()
+    with phase("aggregation"):
+        points_by_driver = season(selected_year).points_by_driver.head(20)
+        points_by_driver = points_by_driver.assign(surname=driver_labels(points_by_driver["driverId"]))
 
-    fig = px.bar(
-        points_by_driver.sort_values(by="points", ascending=False).head(20),
+    fig = colored_bar(
+        points_by_driver, "driverId", px.colors.qualitative.Set3,
         x="points", y="surname", orientation="h",
         title=f"Puntos por Piloto en {selected_year} (Top 20)",
-        labels={"points": "Puntos", "surname": "Piloto"},
-        color="surname",
-        color_discrete_sequence=px.colors.qualitative.Set3
+        labels={"points": "Puntos", "surname": "Piloto"}
     )
     fig.update_layout(height=700)
     return fig
 
 ## 2. Consistencia de Pilotos
-@app.callback(
-    Output("pilot-consistency", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("pilot-consistency")
 def update_pilot_consistency(selected_year):
-    filtered_data = results_cleaned[results_cleaned["year"] == selected_year]
-    avg_positions = filtered_data.groupby("surname")["positionOrder"].mean().reset_index()
+    with phase("aggregation"):
+        avg_positions = season(selected_year).avg_positions
+        avg_positions = avg_positions.assign(surname=driver_labels(avg_positions["driverId"]))
 
     fig = px.bar(
-        avg_positions.sort_values(by="positionOrder"),
+        avg_positions,
         x="positionOrder", y="surname", orientation="h",
         title=f"Consistencia de los Pilotos en {selected_year}",
         labels={"positionOrder": "Posición Promedio", "surname": "Piloto"},
@@ -147,18 +644,16 @@ def update_pilot_consistency(selected_year):
     # Ajustar tamaño y márgenes del gráfico
     fig.update_layout(
         height=800,  # Cambia la altura
-        width=1850,  # Cambia el ancho
+        width=layout_width(),  # Cambia el ancho
         margin={"l": 100, "r": 100, "t": 50, "b": 100},  # Márgenes para espacio extra
     )
     return fig
 
 ## 3. Impacto de la Clasificación
-@app.callback(
-    Output("classification-impact", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("classification-impact")
 def update_classification_impact(selected_year):
-    filtered_data = results_cleaned[results_cleaned["year"] == selected_year]
+    with phase("filter"):
+        filtered_data = season(selected_year).results
 
     fig = px.scatter(
         filtered_data, x="grid", y="positionOrder",
@@ -169,15 +664,46 @@ def update_classification_impact(selected_year):
     )
     return fig
 
+# Toda la historia: gráfico aparte, el único que recorre todas las temporadas
+# (en segundo plano con F1_BACKGROUND_CALLBACKS=1). Mientras el selector está
+# en la temporada no se calcula nada: el gráfico está oculto
+@graph_callback("classification-impact-all", inputs=["classification-scope"], per_season=False, heavy=True)
+def update_classification_impact_all(selected_year, scope="season"):
+    if scope != "all":
+        return go.Figure()
+    with phase("aggregation"):
+        counts = registry.get("grid_finish_histogram").counts_for()
+    return classification_heatmap(counts, "todas las temporadas")
+
+# Varias temporadas: un mapa de calor con el número de resultados por celda
+# (salida, llegada) en lugar de un marcador por resultado
+def classification_heatmap(counts, period):
+    finish_by_grid = np.where(counts > 0, counts, np.nan).T
+    fig = go.Figure(go.Heatmap(
+        z=finish_by_grid,
+        x=np.arange(1, counts.shape[0] + 1),
+        y=np.arange(1, counts.shape[1] + 1),
+        colorscale="Viridis",
+        colorbar={"title": "Resultados"},
+        hovertemplate="Salida %{x} → Final %{y}: %{z} resultados<extra></extra>",
+    ))
+    fig.update_layout(
+        title=f"Impacto de la Clasificación ({period})",
+        xaxis_title="Posición en Clasificación",
+        yaxis_title="Posición Final",
+        height=700,
+    )
+    return fig
+
 ## 4. Impacto de las Paradas en Boxes
-@app.callback(
-    Output("pitstop-impact", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("pitstop-impact")
 def update_pitstop_impact(selected_year):
-    pit_stops_aggregated = pit_stops.groupby(["raceId", "driverId"]).size().reset_index(name="num_pit_stops")
-    filtered_data = results_cleaned[results_cleaned["year"] == selected_year]
-    merged_data = filtered_data.merge(pit_stops_aggregated, on=["raceId", "driverId"], how="left")
+    with phase("filter"):
+        pit_stop_counts = registry.get("pit_stop_counts")
+        filtered_data = season(selected_year).results
+    with phase("aggregation"):
+        keys = pd.MultiIndex.from_arrays([filtered_data["raceId"], filtered_data["driverId"]])
+        merged_data = filtered_data.assign(num_pit_stops=pit_stop_counts.reindex(keys).to_numpy())
 
     fig = px.box(
         merged_data, x="num_pit_stops", y="positionOrder",
@@ -187,75 +713,100 @@ def update_pitstop_impact(selected_year):
     return fig
 
 ## 5. Rendimiento de Equipos por Temporada
-@app.callback(
-    Output("team-performance", "figure"),
-    Input("year-selector", "value")
-)
-def update_team_performance(selected_year):
-    filtered_data = constructor_results[constructor_results["raceId"].isin(races[races["year"] == selected_year]["raceId"])]
-    team_points = filtered_data.groupby("constructorId")["points"].sum().reset_index()
-    team_points = team_points.merge(constructors[["constructorId", "name"]], on="constructorId")
+@graph_callback("team-performance", inputs=["team-scope"],
+                all_time_when=lambda scope: scope == "all")
+def update_team_performance(selected_year, scope="season"):
+    if scope == "all":
+        return team_eras_figure()
+    # Columna de la temporada en la matriz equipo x temporada
+    with phase("filter"):
+        team_points = registry.get("constructor_matrix").season(selected_year)
+        team_points["name"] = registry.get("constructor_names").reindex(team_points["constructorId"]).to_numpy()
+        team_points["position"] = team_points["position"].replace(0, None)
 
-    fig = px.bar(
-        team_points.sort_values(by="points", ascending=False),
+    fig = colored_bar(
+        team_points, "name", px.colors.qualitative.Pastel,
         x="points", y="name", orientation="h",
         title=f"Puntos por Equipo en {selected_year}",
-        labels={"points": "Puntos", "name": "Equipo"},
-        color="name",
-        color_discrete_sequence=px.colors.qualitative.Pastel
+        labels={"points": "Puntos", "name": "Equipo", "position": "Posición final"},
+        hover_data=["position"]
+    )
+    return fig
+
+# Comparación entre épocas: porcentaje de los puntos de cada temporada para
+# los equipos que alguna vez acabaron entre los tres primeros (o, sin
+# constructor_standings, los 25 con más porcentaje acumulado)
+def team_eras_figure():
+    with phase("aggregation"):
+        matrix = registry.get("constructor_matrix")
+        share = matrix.points_share()
+        podium = ((matrix.positions > 0) & (matrix.positions <= 3)).any(axis=1)
+        teams = np.flatnonzero(podium) if podium.any() else np.argsort(-share.sum(axis=1))[:25]
+        # Por orden de primera temporada con puntos
+        teams = teams[np.argsort(np.argmax(share[teams] > 0, axis=1), kind="stable")]
+        positions = matrix.positions[teams].astype(object)
+        positions[positions == 0] = "-"
+
+    fig = go.Figure(go.Heatmap(
+        z=np.where(matrix.entered[teams], share[teams], np.nan), x=matrix.years,
+        y=registry.get("constructor_names").reindex(matrix.constructor_ids[teams]).to_numpy(),
+        customdata=positions, colorscale="Viridis", colorbar={"title": "% puntos"},
+        hovertemplate="%{y} %{x}<br>%{z:.1f}% de los puntos<br>Posición final: %{customdata}<extra></extra>",
+    ))
+    fig.update_layout(
+        title="Porcentaje de los Puntos de cada Temporada por Equipo",
+        xaxis_title="Temporada", yaxis={"autorange": "reversed"},
+        height=max(450, 22 * len(teams)), width=layout_width(),
     )
     return fig
 
 ## 6. Evolución de los Puntos por Carrera
-@app.callback(
-    Output("race-points-evolution", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("race-points-evolution")
 def update_race_points_evolution(selected_year):
-    filtered_data = results_cleaned[results_cleaned["year"] == selected_year]
-    race_points = filtered_data.groupby(["raceId", "surname"])["points"].sum().reset_index()
-    race_points = race_points.merge(races[["raceId", "circuitId", "date"]], on="raceId", how="left")
-    race_points = race_points.merge(circuits[["circuitId", "name"]], on="circuitId", how="left")
-    race_points = race_points.dropna(subset=["name", "points"])
-    race_points = race_points.sort_values(by=["date", "raceId"])
-    race_points["cumulative_points"] = race_points.groupby("surname")["points"].cumsum()
-    race_points = race_points.dropna(subset=["cumulative_points"])
+    with phase("filter"):
+        evolution = registry.get("points_evolution").get(selected_year)
+    fig = go.Figure()
+    if evolution is not None:
+        with phase("filter"):
+            races = registry.get("races").set_index("raceId")
+            circuits = registry.get("circuits").set_index("circuitId")["name"]
+            circuit_names = circuits.reindex(races.loc[evolution.race_ids, "circuitId"]).astype(str).to_numpy()
+        colors = px.colors.qualitative.Dark2
+        # Una traza por columna de la matriz, sin reconstruir una tabla larga
+        for i, surname in enumerate(driver_labels(evolution.driver_ids)):
+            fig.add_trace(go.Scatter(
+                x=evolution.rounds, y=evolution.points[:, i], name=surname, mode="lines",
+                line={"color": colors[i % len(colors)]}, customdata=circuit_names,
+                hovertemplate="%{customdata}: %{y} puntos",
+            ))
+        fig.update_xaxes(tickvals=evolution.rounds, ticktext=circuit_names)
 
-    fig = px.line(
-        race_points,
-        x="name", y="cumulative_points", color="surname",
+    fig.update_layout(
         title=f"Evolución de Puntos por Carrera en {selected_year}",
-        labels={"name": "Circuito", "cumulative_points": "Puntos Acumulados", "surname": "Piloto"},
-        color_discrete_sequence=px.colors.qualitative.Dark2
+        xaxis_title="Circuito", yaxis_title="Puntos Acumulados", legend_title="Piloto",
+        height=700,
     )
-    fig.update_layout(height=700)
     return fig
 
 ## 7. Mejores Tiempos por Vuelta
-@app.callback(
-    Output("best-lap-times", "figure"),
-    [Input("year-selector", "value"), Input("circuit-selector", "value")]
-)
+@graph_callback("best-lap-times", inputs=["circuit-selector"])
 def update_best_lap_times(selected_year, selected_circuit):
-    lap_data = lap_times.merge(races[["raceId", "year", "name"]], on="raceId")
-    filtered_data = lap_data[lap_data["year"] == selected_year]
-    if selected_circuit:
-        filtered_data = filtered_data[filtered_data["name"] == selected_circuit]
-    best_laps = filtered_data.groupby("driverId")["milliseconds"].min().reset_index()
-    best_laps = best_laps.merge(drivers, on="driverId")
-    best_laps["formatted_time"] = best_laps["milliseconds"].apply(format_time)
+    # Búsqueda en el índice precalculado (ya ordenado por tiempo)
+    with phase("filter"):
+        best_laps = registry.get("best_lap_index").get(selected_year, selected_circuit).reset_index()
+        best_laps["surname"] = driver_labels(best_laps["driverId"])
+        best_laps["formatted_time"] = format_milliseconds(best_laps["milliseconds"])
 
-    fig = px.bar(
-        best_laps.sort_values(by="milliseconds"), x="formatted_time", y="surname", orientation="h",
+    fig = colored_bar(
+        best_laps, "driverId", px.colors.qualitative.Pastel,
+        x="formatted_time", y="surname", orientation="h",
         title=f"Mejores Tiempos por Vuelta en {selected_year}" + (f" - {selected_circuit}" if selected_circuit else ""),
-        labels={"formatted_time": "Tiempo", "surname": "Piloto"},
-        color="surname",
-        color_discrete_sequence=px.colors.qualitative.Pastel
+        labels={"formatted_time": "Tiempo", "surname": "Piloto"}
     )
     # Ajustar tamaño y márgenes del gráfico
     fig.update_layout(
         height=800,  # Cambia la altura
-        width=1850,  # Cambia el ancho
+        width=layout_width(),  # Cambia el ancho
         margin={"l": 100, "r": 100, "t": 50, "b": 100},  # Márgenes para espacio extra
     )
     return fig
@@ -263,14 +814,14 @@ def update_best_lap_times(selected_year, selected_circuit):
 
 
 ## 8. Circuitos en el Mapa
-@app.callback(
-    Output("circuit-map", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("circuit-map")
 def update_circuit_map(selected_year):
-    filtered_races = races[races["year"] == selected_year]
-    circuits_map = filtered_races.merge(circuits, on="circuitId", how="inner")
-    circuits_map = circuits_map.rename(columns={"name_y": "circuit_name"})
+    with phase("filter"):
+        races = registry.get("races")
+        circuits = registry.get("circuits")
+        filtered_races = races[races["year"] == selected_year]
+        circuits_map = filtered_races.merge(circuits, on="circuitId", how="inner")
+        circuits_map = circuits_map.rename(columns={"name_y": "circuit_name"})
 
     fig = px.scatter_mapbox(
         circuits_map, lat="lat", lon="lng", hover_name="circuit_name",
@@ -282,20 +833,18 @@ def update_circuit_map(selected_year):
     fig.update_layout(
         mapbox_style="carto-positron",  # Elegir un estilo de mapa que sea más claro
         height=800,  # Cambia la altura del mapa
-        width=1850,  # Cambia el ancho del mapa
+        width=layout_width(),  # Cambia el ancho del mapa
         margin={"l": 100, "r": 100, "t": 50, "b": 100}  # Márgenes para un mejor ajuste
     )
     return fig
 
 
 ## 9. Distribución de Puntos por Piloto (Gráfico Circular)
-@app.callback(
-    Output("points-pie-chart", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("points-pie-chart")
 def update_points_pie_chart(selected_year):
-    filtered_data = results_cleaned[results_cleaned["year"] == selected_year]
-    points_by_driver = filtered_data.groupby("surname")["points"].sum().reset_index()
+    with phase("aggregation"):
+        points_by_driver = season(selected_year).points_by_driver
+        points_by_driver = points_by_driver.assign(surname=driver_labels(points_by_driver["driverId"]))
 
     fig = px.pie(
         points_by_driver,
@@ -307,54 +856,462 @@ def update_points_pie_chart(selected_year):
     return fig
 
 ## 10. Títulos de Pilotos (Gráfico de Barras)
-@app.callback(
-    Output("titles-bar-chart", "figure"),
-    Input("year-selector", "value")
-)
+@graph_callback("titles-bar-chart", per_season=False)
 def update_titles_bar_chart(selected_year):
-    # Calcular los títulos correctamente (máximo de puntos por piloto cada temporada)
-    season_winners = results_cleaned.groupby(["year", "surname"])["points"].sum().reset_index()
+    # Tabla constante calculada al cargar a partir de driver_standings
+    with phase("aggregation"):
+        titles_by_driver = registry.get("titles_by_driver")
 
-    # Asegurarse de contar solo al ganador por temporada
-    season_winners = season_winners.loc[season_winners.groupby("year")["points"].idxmax()]
+    # Crear gráfico
+    fig = colored_bar(
+        titles_by_driver, "driver", px.colors.qualitative.Pastel,
+        x="titles", y="driver", orientation="h",
+        title="Títulos por Piloto (Oficiales)",
+        labels={"titles": "Títulos", "driver": "Piloto"}
+    )
+    fig.update_layout(showlegend=False, height=max(450, 25 * len(titles_by_driver)))  # Quitar leyenda si no es necesaria
+    return fig
+
+
+## 11. Puntos por Temporada en un Rango de Años
+@graph_callback("range-points", inputs=["year-range", "driver-selector", "constructor-selector"], per_season=False,
+                heavy=True)
+def update_range_points(selected_year, year_range=None, drivers=None, constructors=None):
+    season_cache = registry.get("season_cache")
+    first_year, last_year = year_range or default_year_range(season_cache.years())
+    # Rango de temporadas: un slice contiguo de results_cleaned, sin máscara
+    # sobre toda la tabla
+    with phase("filter"):
+        range_results = season_cache.range(first_year, last_year)
+        if constructors:
+            range_results = range_results[range_results["constructorId"].isin(constructors)]
+        if not drivers:
+            drivers = range_results.groupby("driverId")["points"].sum().nlargest(10).index
+        range_results = range_results[range_results["driverId"].isin(drivers)]
 
-    # Contar los títulos por piloto
-    titles_by_driver = season_winners["surname"].value_counts().reset_index()
-    titles_by_driver.columns = ["surname", "titles"]
+    with phase("aggregation"):
+        season_points = range_results.groupby(["year", "driverId"])["points"].sum().reset_index()
+        season_points["surname"] = driver_labels(season_points["driverId"])
 
-    # Filtrar títulos conocidos (limitar manualmente si necesario)
-    known_titles = {
-        "Schumacher": 7,
-        "Hamilton": 7,
-        "Fangio": 5,
-        "Vettel": 4,
-        "Prost": 4,
-        "Verstappen": 4,
-        "Senna": 3,
-    }
+    fig = driver_traces(
+        px.line, season_points, px.colors.qualitative.Dark2,
+        x="year", y="points", markers=True, hover_data={"surname": True},
+        title=f"Puntos por Temporada entre {first_year} y {last_year}",
+        labels={"year": "Temporada", "points": "Puntos", "surname": "Piloto"}
+    )
+    fig.update_layout(height=600)
+    return fig
 
-    # Normalizar nombres de pilotos en los datos
-    titles_by_driver["surname"] = titles_by_driver["surname"].str.strip()
 
-    # Añadir títulos oficiales al gráfico
-    titles_by_driver["official_titles"] = titles_by_driver["surname"].map(known_titles).fillna(0)
+## 12. Diferencias en Clasificación
+@graph_callback("qualifying-gaps", inputs=["qualifying-view"])
+def update_qualifying_gaps(selected_year, view="pole"):
+    # Slice de la temporada en el índice de clasificación (sin copia)
+    with phase("filter"):
+        qualifying = registry.get("qualifying_index").season(selected_year)
+    if not len(qualifying.rounds):
+        return notice_figure(f"Sin tiempos de clasificación en {selected_year}")
 
-    # Filtrar los pilotos con al menos 1 título
-    titles_by_driver = titles_by_driver[titles_by_driver["official_titles"] > 0]
+    if view == "sessions":
+        return qualifying_sessions_figure(qualifying)
+    if view == "teammates":
+        return qualifying_teammates_figure(qualifying)
+    return qualifying_pole_figure(qualifying)
+
+# Mapa de calor piloto x ronda de la diferencia con la pole, con los pilotos
+# ordenados por su diferencia mediana
+def qualifying_pole_figure(qualifying):
+    with phase("aggregation"):
+        gaps = qualifying.gap_to_pole() / 1000
+        drivers, driver_index = np.unique(qualifying.driver_ids, return_inverse=True)
+        rounds = qualifying.rounds[qualifying.round_starts]
+        round_index = np.searchsorted(rounds, qualifying.rounds)
+        matrix = np.full((len(drivers), len(rounds)), np.nan)
+        matrix[driver_index, round_index] = gaps
+        # Los pilotos sin ningún tiempo van al final
+        medians = pd.Series(gaps).groupby(driver_index).median().reindex(range(len(drivers)))
+        order = np.argsort(medians.fillna(np.inf).to_numpy(), kind="stable")
+
+    fig = go.Figure(go.Heatmap(
+        z=matrix[order], x=rounds, y=driver_labels(drivers[order]),
+        colorscale="Viridis", zmin=0, zmax=float(np.nanpercentile(gaps, 95)) or None,
+        colorbar={"title": "s"},
+        hovertemplate="Ronda %{x}<br>%{y}: %{z:+.3f} s<extra></extra>",
+    ))
+    fig.update_layout(
+        title=f"Diferencia con la Pole por Ronda en {qualifying.year}",
+        xaxis_title="Ronda", yaxis={"autorange": "reversed"},
+        height=max(450, 22 * len(drivers)), width=layout_width(),
+    )
+    return fig
+
+# Diferencia mediana de cada piloto con su compañero en la temporada
+def qualifying_teammates_figure(qualifying):
+    with phase("aggregation"):
+        gaps = pd.Series(qualifying.teammate_gap() / 1000).groupby(qualifying.driver_ids).median().dropna().sort_values()
+        teammates = pd.DataFrame({"driverId": gaps.index, "gap": gaps.to_numpy()})
+        teammates["surname"] = driver_labels(teammates["driverId"])
+
+    fig = colored_bar(
+        teammates, "driverId", px.colors.qualitative.Pastel,
+        x="gap", y="surname", orientation="h",
+        title=f"Diferencia Mediana con el Compañero en Clasificación en {qualifying.year}",
+        labels={"gap": "Diferencia (s)", "surname": "Piloto"}
+    )
+    fig.update_layout(showlegend=False, height=max(450, 25 * len(teammates)), yaxis={"autorange": "reversed"})
+    return fig
+
+# Mejor tiempo de cada sesión (Q1, Q2, Q3) en cada ronda
+def qualifying_sessions_figure(qualifying):
+    with phase("aggregation"):
+        bests = qualifying.session_bests() / 1000
+        rounds = qualifying.rounds[qualifying.round_starts]
+        sessions = pd.DataFrame({
+            "round": np.repeat(rounds, len(SESSIONS)),
+            "session": np.tile([s.upper() for s in SESSIONS], len(rounds)),
+            "seconds": bests.ravel(),
+        }).dropna()
+
+    fig = px.line(
+        sessions,
+        x="round", y="seconds", color="session", markers=True,
+        title=f"Mejor Tiempo de cada Sesión de Clasificación en {qualifying.year}",
+        labels={"round": "Ronda", "seconds": "Tiempo (s)", "session": "Sesión"},
+        color_discrete_sequence=px.colors.qualitative.Dark2
+    )
+    fig.update_layout(height=600)
+    return fig
+
+
+## 13. Estrategia de Paradas por Carrera
+@graph_callback("pit-strategy", inputs=["strategy-race", "strategy-view"])
+def update_pit_strategy(selected_year, race_name=None, view="stints"):
+    # Slice de la carrera en el índice de estrategia, sin cruces por petición
+    with phase("filter"):
+        pit_strategy = registry.get("pit_strategy")
+        race = strategy_race(pit_strategy, selected_year, race_name)
+    if race is None:
+        return notice_figure(f"Sin paradas registradas en {race_name or selected_year}")
+    strategy = pit_strategy.race(int(race["raceId"]))
+    title = f"{race['name']} {selected_year}"
+
+    if view == "undercuts":
+        if strategy.undercuts is None:
+            raise MissingTableError("lap_times")
+        return undercuts_figure(strategy, title)
+    if view == "stops":
+        return stop_times_figure(strategy, title)
+    return stints_figure(strategy, title)
+
+# Carrera elegida (o la primera de la temporada con paradas) como fila de races
+def strategy_race(pit_strategy, selected_year, race_name):
+    races = registry.get("races")
+    season_races = races[(races["year"] == selected_year) & races["raceId"].isin(pit_strategy.race_ids())]
+    if race_name:
+        season_races = season_races[season_races["name"] == race_name]
+    if season_races.empty:
+        return None
+    return season_races.sort_values("round").iloc[0]
+
+# Stints de cada piloto como barras horizontales apiladas por vuelta, con los
+# pilotos en su orden de llegada
+def stints_figure(strategy, title):
+    with phase("aggregation"):
+        results = registry.get("results")
+        finish = results.loc[results["raceId"] == strategy.race_id].set_index("driverId")["positionOrder"]
+        stints = strategy.stints.assign(
+            finish=finish.reindex(strategy.stints["driverId"]).to_numpy(),
+            stint=strategy.stints["stint"].astype(str),
+        ).sort_values(["finish", "stint"])
+        stints["surname"] = driver_labels(stints["driverId"])
 
-    # Crear gráfico
     fig = px.bar(
-        titles_by_driver.sort_values(by="official_titles", ascending=False),
-        x="official_titles", y="surname", orientation="h",
-        title="Títulos por Piloto (Oficiales)",
-        labels={"official_titles": "Títulos", "surname": "Piloto"},
-        color="surname",
+        stints, x="laps", y="surname", base="start_lap", color="stint", orientation="h",
+        title=f"Stints en {title}",
+        labels={"laps": "Vueltas", "surname": "Piloto", "stint": "Stint", "start_lap": "Desde la vuelta"},
+        hover_data=["start_lap", "end_lap"],
         color_discrete_sequence=px.colors.qualitative.Pastel
     )
-    fig.update_layout(showlegend=False)  # Quitar leyenda si no es necesaria
+    fig.update_layout(
+        barmode="overlay", xaxis_title="Vuelta",
+        yaxis={"categoryorder": "array", "categoryarray": list(pd.unique(stints["surname"])), "autorange": "reversed"},
+        height=max(450, 25 * stints["driverId"].nunique()),
+    )
+    return fig
+
+# Distribución del tiempo de cada parada por piloto
+def stop_times_figure(strategy, title):
+    with phase("aggregation"):
+        stops = strategy.stops.assign(seconds=strategy.stops["milliseconds"] / 1000)
+        stops["surname"] = driver_labels(stops["driverId"])
+
+    fig = px.box(
+        stops, x="surname", y="seconds", points="all", hover_data=["stop", "lap"],
+        title=f"Tiempo de Parada en {title}",
+        labels={"surname": "Piloto", "seconds": "Tiempo en boxes (s)", "stop": "Parada", "lap": "Vuelta"}
+    )
+    fig.update_layout(width=layout_width())
+    return fig
+
+# Intentos de undercut: posiciones ganadas (o perdidas) por el piloto que
+# para primero frente al coche que tenía delante
+def undercuts_figure(strategy, title):
+    with phase("aggregation"):
+        undercuts = strategy.undercuts.assign(
+            gain=strategy.undercuts["defender_after"] - strategy.undercuts["attacker_after"],
+            outcome=np.where(strategy.undercuts["success"], "Undercut", "Overcut"),
+        )
+        undercuts["pair"] = (
+            driver_labels(undercuts["attacker"]) + " → " + driver_labels(undercuts["defender"])
+            + " (v. " + undercuts["lap"].astype(str) + ")"
+        )
+
+    fig = px.bar(
+        undercuts, x="gain", y="pair", color="outcome", orientation="h",
+        title=f"Undercuts y Overcuts en {title}",
+        labels={"gain": "Ventaja del atacante tras las dos paradas (posiciones)", "pair": "Atacante → Defensor",
+                "outcome": "Resultado"},
+        hover_data=["defender_lap"],
+        color_discrete_map={"Undercut": "#2ca02c", "Overcut": "#d62728"}
+    )
+    fig.update_layout(yaxis={"autorange": "reversed"}, height=max(450, 30 * len(undercuts)))
+    return fig
+
+
+## 14. Duelo entre Pilotos
+# Sin pilotos elegidos se usan los dos primeros de la temporada, así que la
+# vista de toda la historia sólo es independiente del año con los dos elegidos
+@graph_callback("head-to-head", inputs=["h2h-driver-a", "h2h-driver-b", "h2h-scope"],
+                all_time_when=lambda driver_a, driver_b, scope: scope == "all" and driver_a and driver_b)
+def update_head_to_head(selected_year, driver_a=None, driver_b=None, scope="season"):
+    with phase("filter"):
+        # El mismo piloto en los dos selectores: el rival pasa a ser el primero
+        # de la clasificación de la temporada que no sea él
+        if driver_b == driver_a:
+            driver_b = None
+        if not driver_a or not driver_b:
+            leaders = season(selected_year).points_by_driver["driverId"].tolist()
+            leaders = iter([d for d in leaders if d not in (driver_a, driver_b)])
+            driver_a = driver_a or next(leaders)
+            driver_b = driver_b or next(leaders)
+        period = (None, None) if scope == "all" else (selected_year, selected_year)
+        duel = registry.get("head_to_head").compare(driver_a, driver_b, *period)
+        names = driver_labels([driver_a, driver_b])
+
+    fig = make_subplots(rows=1, cols=2, subplot_titles=("Por delante del rival", "Puntos en carreras comunes"))
+    colors = px.colors.qualitative.Dark2
+    for name, ahead, quali_ahead, points, color in zip(
+        names, (duel.a_ahead, duel.b_ahead), (duel.a_quali_ahead, duel.b_quali_ahead),
+        (duel.a_points, duel.b_points), colors
+    ):
+        fig.add_trace(go.Bar(name=name, x=["Carrera", "Clasificación"], y=[ahead, quali_ahead],
+                             marker_color=color, text=[ahead, quali_ahead], legendgroup=name), row=1, col=1)
+        fig.add_trace(go.Bar(name=name, x=["Puntos"], y=[points], marker_color=color, text=[points],
+                             legendgroup=name, showlegend=False), row=1, col=2)
+    fig.update_layout(
+        title=f"{names[0]} vs {names[1]} " + ("en toda la historia" if scope == "all" else f"en {selected_year}")
+              + f": {duel.races} carreras y {duel.qualifying} clasificaciones juntos",
+        barmode="group", height=500,
+    )
     return fig
 
 
+# Figura en el JSON que se envía al navegador (compacto o estándar)
+def serialize_figure(fig):
+    return to_compact_json(fig) if COMPACT_FIGURES else pio.to_json(fig, validate=False)
+
+# Año (None si con estos valores el gráfico no depende de él) y variante con
+# los valores de los demás selectores de una figura en la caché
+def figure_cache_key(graph_id, inputs, selected_year, values):
+    all_time = ALL_TIME_GRAPHS.get(graph_id)
+    values = tuple(values[:len(inputs)])
+    cache_year = None if all_time is not None and all_time(*values) else selected_year
+    # Los selectores múltiples llegan como listas: la clave debe ser hashable
+    variant = tuple(tuple(value) if isinstance(value, list) else value for value in values) if inputs else None
+    return cache_year, variant
+
+# Sirve la figura desde la caché o la construye y guarda serializada. Las
+# figuras de aviso por datos ausentes no se guardan (MissingTableError sale
+# antes de llegar a put)
+def cached_figure(graph_id, callback, inputs):
+    @functools.wraps(callback)
+    def wrapper(selected_year, *values):
+        values = values[:len(inputs)]
+        cache_year, variant = figure_cache_key(graph_id, inputs, selected_year, values)
+        figure_cache = registry.get("figure_cache")
+        figure_json = figure_cache.get(graph_id, cache_year, variant)
+        metrics.cache_result(figure_json is not None)
+        if figure_json is None:
+            # La fase "figure" es el tiempo del callback sin sus fases internas
+            with phase("figure"):
+                fig = callback(selected_year, *values)
+            with phase("serialization"):
+                figure_json = serialize_figure(fig)
+            figure_cache.put(graph_id, cache_year, variant, figure_json)
+        metrics.payload(len(figure_json))
+        with phase("serialization"):
+            return json.loads(figure_json)
+    return wrapper
+
+# Mide cada petición de un gráfico (aunque acabe en la figura de aviso)
+def instrumented(graph_id, callback):
+    @functools.wraps(callback)
+    def wrapper(*args):
+        with metrics.request(graph_id):
+            return callback(*args)
+    return wrapper
+
+# Modo compacto: si sólo cambia el año, el navegador ya tiene la figura
+# anterior; se envía un parche sin la plantilla, o nada si el gráfico no
+# depende del año
+def patch_on_year_change(graph_id, callback, inputs):
+    all_time = ALL_TIME_GRAPHS.get(graph_id)
+
+    @functools.wraps(callback)
+    def wrapper(selected_year, *values):
+        if ctx.triggered_id != "year-selector":
+            return callback(selected_year, *values)
+        if all_time is not None and all_time(*values[:len(inputs)]):
+            return no_update
+        figure = callback(selected_year, *values)
+        return year_patch(figure) if isinstance(figure, dict) else figure
+    return wrapper
+
+def served_graph_callbacks():
+    served = []
+    for graph_id, callback, inputs in GRAPH_CALLBACKS:
+        callback = instrumented(graph_id, degrade_on_missing(cached_figure(graph_id, callback, inputs)))
+        if COMPACT_FIGURES:
+            callback = patch_on_year_change(graph_id, callback, inputs)
+        served.append((graph_id, callback, inputs))
+    return served
+
+# Registro de callbacks
+def register_graph_callbacks(batched, background=False):
+    year_input = Input("year-selector", "value")
+    graph_callbacks = served_graph_callbacks()
+
+    # En modo segundo plano los gráficos pesados se registran aparte, cada uno
+    # como background callback con su indicador de progreso
+    if background:
+        register_background_callbacks([g for g in graph_callbacks if g[0] in HEAVY_GRAPHS])
+        graph_callbacks = [g for g in graph_callbacks if g[0] not in HEAVY_GRAPHS]
+
+    if not batched:
+        for graph_id, callback, inputs in graph_callbacks:
+            app.callback(Output(graph_id, "figure"), [year_input] + [Input(i, "value") for i in inputs])(callback)
+        return
+
+    # Modo agrupado: una sola petición por cambio de año que calcula la
+    # temporada una vez y devuelve todas las figuras juntas. Si cambia otro
+    # selector sólo se recalculan los gráficos que lo usan
+    extra_inputs = list(dict.fromkeys(i for _, _, inputs in graph_callbacks for i in inputs))
+
+    @app.callback(
+        [Output(graph_id, "figure") for graph_id, _, _ in graph_callbacks],
+        [year_input] + [Input(i, "value") for i in extra_inputs]
+    )
+    def update_all_graphs(selected_year, *extra_values):
+        values = dict(zip(extra_inputs, extra_values))
+        triggered = ctx.triggered_id
+        figures = []
+        for _, callback, inputs in graph_callbacks:
+            if triggered in extra_inputs and triggered not in inputs:
+                figures.append(no_update)
+            else:
+                figures.append(callback(selected_year, *(values[i] for i in inputs)))
+        return figures
+
+def register_background_callbacks(graph_callbacks):
+    version = lambda: registry.get("figure_cache").version
+    cache, manager = background_manager(os.environ.get("F1_BACKGROUND_CACHE_DIR", "./data/.background"), version)
+    for graph_id, callback, inputs in graph_callbacks:
+        # Un gráfico que no depende del año sólo recibe el año como estado, para
+        # que cambiar de temporada no lance otro cálculo en segundo plano, y
+        # comparte el cálculo entre temporadas. Sin otros selectores el año
+        # tiene que seguir siendo su Input: los gráficos así no se marcan heavy
+        year_independent = ALL_TIME_GRAPHS.get(graph_id) is always_all_time
+        year_dependency = State if inputs and year_independent else Input
+        app.callback(
+            Output(graph_id, "figure"),
+            [year_dependency("year-selector", "value")] + [Input(i, "value") for i in inputs],
+            background=True,
+            manager=manager,
+            progress=Output(f"{graph_id}-progress", "children"),
+            progress_default="",
+        )(deduplicated(cache, graph_id, callback, version, year_independent))
+
+BATCHED_CALLBACKS = os.environ.get("F1_BATCHED_CALLBACKS", "0") == "1"
+BACKGROUND_CALLBACKS = os.environ.get("F1_BACKGROUND_CALLBACKS", "0") == "1"
+register_graph_callbacks(BATCHED_CALLBACKS, BACKGROUND_CALLBACKS)
+
+# Las peticiones cuyas figuras están todas en la caché se responden antes de
+# llegar a Dash con el JSON guardado tal cual, sin json.loads ni volver a
+# serializar la figura. Siguen por los callbacks los fallos de caché, los
+# cambios de año en modo compacto (que envían un parche) y, en modo agrupado,
+# los cambios de un selector que no usan todos los gráficos de la respuesta
+def serve_cached_figures(server):
+    graph_inputs = {graph_id: inputs for graph_id, _, inputs in GRAPH_CALLBACKS}
+
+    @server.before_request
+    def cached_figures():
+        if not dash_update_request():
+            return None
+        payload = request.get_json(silent=True) or {}
+        triggered = {prop.split(".")[0] for prop in payload.get("changedPropIds") or []}
+        if COMPACT_FIGURES and "year-selector" in triggered:
+            return None
+        figure_cache = registry.get("figure_cache")
+        served = []
+
+        def figure_json(graph_id, values):
+            inputs = graph_inputs.get(graph_id)
+            if inputs is None or (triggered and not triggered & {"year-selector", *inputs}):
+                return None
+            cache_year, variant = figure_cache_key(
+                graph_id, inputs, values.get("year-selector"), [values.get(i) for i in inputs]
+            )
+            figure = figure_cache.get(graph_id, cache_year, variant, count=False)
+            if figure is not None:
+                served.append((graph_id, len(figure)))
+            return figure
+
+        body = figures_response(payload, figure_json)
+        if body is None:
+            return None
+        figure_cache.count_hits(len(served))
+        for graph_id, size in served:
+            with metrics.request(graph_id):
+                metrics.cache_result(True)
+                metrics.payload(size)
+        return Response(body, mimetype="application/json")
+    return cached_figures
+
+serve_cached_figures(app.server)
+
+# Los selectores de carrera sólo ofrecen las carreras del año elegido; si la
+# carrera seleccionada no se corrió ese año se vuelve al valor por defecto
+def update_circuit_options(selected_year, selected_circuit):
+    circuits = season_circuits(selected_year)
+    value = no_update if selected_circuit in circuits or selected_circuit is None else None
+    return [{"label": name, "value": name} for name in circuits], value
+
+for selector_id in ("circuit-selector", "strategy-race"):
+    app.callback(
+        [Output(selector_id, "options"), Output(selector_id, "value")],
+        [Input("year-selector", "value")],
+        [State(selector_id, "value")]
+    )(update_circuit_options)
+
+# Impacto de la clasificación: se muestra el gráfico de la temporada o el de
+# toda la historia según el selector
+@app.callback(
+    [Output("classification-season-view", "style"), Output("classification-all-view", "style")],
+    [Input("classification-scope", "value")]
+)
+def update_classification_view(scope):
+    hidden = {"display": "none"}
+    return (hidden, {}) if scope == "all" else ({}, hidden)
 
 # Ejecutar la aplicación
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+import functools
+import json
+
+# Ejecución en segundo plano de los gráficos pesados (F1_BACKGROUND_CALLBACKS=1)
+# con los background callbacks de Dash sobre diskcache: cada petición se
+# calcula en un proceso aparte, sin bloquear el worker de gunicorn y sin
+# broker externo. Las peticiones idénticas que llegan a la vez comparten un
+# único cálculo: la primera toma un bloqueo en diskcache para su clave y las
+# demás esperan y leen el resultado que deja guardado.
+
+# Resultado compartido durante este tiempo (la caché de figuras sigue siendo
+# la que los conserva a largo plazo)
+RESULT_EXPIRE = 600
+
+
+# Dash guarda el resultado bajo una clave que sólo depende de la función y sus
+# argumentos, así que las peticiones idénticas comparten la entrada; con
+# cache_by (la versión de los datos) no se borra al leerla la primera
+def background_manager(cache_dir, version):
+    # Dependencias opcionales: sólo se importan si se activa el modo
+    import diskcache
+    from dash import DiskcacheManager
+
+    cache = diskcache.Cache(cache_dir)
+    return cache, DiskcacheManager(cache, cache_by=[version], expire=RESULT_EXPIRE)
+
+
+# Los gráficos que no dependen del año (year_independent) comparten el cálculo
+# entre temporadas: el año, su primer argumento, no forma parte de la clave
+def deduplicated(cache, graph_id, callback, version, year_independent=False):
+    import diskcache
+
+    @functools.wraps(callback)
+    def wrapper(set_progress, *args):
+        key_args = args[1:] if year_independent else args
+        key = f"f1:{version()}:{graph_id}:{json.dumps(key_args, default=str)}"
+        result = cache.get(key)
+        if result is None:
+            lock = diskcache.Lock(cache, f"{key}:lock", expire=RESULT_EXPIRE)
+            if lock.locked():
+                set_progress("En espera: hay un cálculo idéntico en curso…")
+            with lock:
+                result = cache.get(key)
+                if result is None:
+                    set_progress("Calculando…")
+                    result = callback(*args)
+                    cache.set(key, result, expire=RESULT_EXPIRE)
+        set_progress("")
+        return result
+    return wrapper
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Compara el tiempo total de render de un cambio de año entre los callbacks
+# independientes (una petición por gráfico) y el callback agrupado
+# (F1_BATCHED_CALLBACKS=1). Cada modo se mide en un proceso nuevo para que
+# arranque con las cachés vacías.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def dependency_payload(dependency, values):
+    outputs = dependency["output"]
+    if outputs.startswith(".."):
+        outputs_spec = [dict(zip(("id", "property"), o.split("."))) for o in outputs.strip(".").split("...")]
+    else:
+        outputs_spec = dict(zip(("id", "property"), outputs.split(".")))
+    return {
+        "output": outputs,
+        "outputs": outputs_spec,
+        "inputs": [
+            {"id": i["id"], "property": i["property"], "value": values.get(i["id"])}
+            for i in dependency["inputs"]
+        ],
+        "changedPropIds": ["year-selector.value"],
+        "state": [
+            {"id": s["id"], "property": s["property"], "value": values.get(s["id"])}
+            for s in dependency.get("state", [])
+        ],
+    }
+
+
+def measure_mode(years, repeat):
+    sys.path.insert(0, RAIZ)
+    os.chdir(RAIZ)
+    import app
+
+    client = app.app.server.test_client()
+    client.get("/")
+    dependencies = client.get("/_dash-dependencies").get_json()
+    dependencies = [d for d in dependencies if any(i["id"] == "year-selector" for i in d["inputs"])]
+
+    runs = []
+    for ronda in range(repeat):
+        for year in years:
+            values = {"year-selector": year, "circuit-selector": None}
+            inicio = time.perf_counter()
+            payload_bytes = 0
+            for dependency in dependencies:
+                response = client.post("/_dash-update-component", json=dependency_payload(dependency, values))
+                assert response.status_code == 200, response.data[:500]
+                payload_bytes += len(response.data)
+            runs.append({
+                "year": year,
+                "round": ronda,
+                "ms": (time.perf_counter() - inicio) * 1000,
+                "requests": len(dependencies),
+                "bytes": payload_bytes,
+            })
+    return runs
+
+
+def run_in_subprocess(batched, years, repeat):
+    env = dict(os.environ, F1_BATCHED_CALLBACKS="1" if batched else "0")
+    command = [sys.executable, __file__, "--child", "--repeat", str(repeat), "--years", *map(str, years)]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(name, runs):
+    cold = [r["ms"] for r in runs if r["round"] == 0]
+    warm = [r["ms"] for r in runs if r["round"] > 0]
+    print(f"{name:<12} peticiones/cambio={runs[0]['requests']:>2}  "
+          f"frío={sum(cold) / len(cold):8.1f} ms  "
+          f"caliente={(sum(warm) / len(warm)) if warm else float('nan'):8.1f} ms  "
+          f"bytes={runs[0]['bytes']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de callbacks por gráfico frente al callback agrupado")
+    parser.add_argument("--years", type=int, nargs="+", default=[1950, 1990, 2021])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Emitir los resultados en JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_mode(args.years, args.repeat)))
+        sys.exit(0)
+
+    results = {
+        "per_graph": run_in_subprocess(False, args.years, args.repeat),
+        "batched": run_in_subprocess(True, args.years, args.repeat),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, runs in results.items():
+            summarize(name, runs)
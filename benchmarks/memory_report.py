@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import sys
+
+# Memoria por tabla derivada: uniones completas de results con drivers y
+# races (como se construían antes results_cleaned y results_drivers_races)
+# frente a las tablas recortadas que prepara app.py ahora.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def full_merge(registry):
+    results = registry.get("results")
+    merged = results.merge(registry.get("drivers"), on="driverId").merge(registry.get("races"), on="raceId")
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Huella en memoria de las tablas preparadas, antes y después")
+    parser.add_argument("--json", action="store_true", help="Emitir los resultados en JSON")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    import app
+
+    results_drivers_races = full_merge(app.registry)
+    results_cleaned_full = results_drivers_races[(results_drivers_races["grid"] > 0) & (results_drivers_races["positionOrder"] > 0)]
+
+    before = {
+        "results_cleaned": megabytes(results_cleaned_full),
+        "results_drivers_races": megabytes(results_drivers_races),
+    }
+    after = {
+        "results_cleaned": megabytes(app.registry.get("results_cleaned")),
+        "driver_names": megabytes(app.registry.get("driver_names")),
+    }
+    report = {
+        "before_mb": before,
+        "after_mb": after,
+        "before_total_mb": sum(before.values()),
+        "after_total_mb": sum(after.values()),
+        "columns_before": len(results_cleaned_full.columns),
+        "columns_after": len(app.registry.get("results_cleaned").columns),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'tabla':<24}{'antes MB':>10}{'después MB':>12}")
+        for name in sorted(before.keys() | after.keys()):
+            antes = f"{before[name]:.2f}" if name in before else "-"
+            despues = f"{after[name]:.2f}" if name in after else "-"
+            print(f"{name:<24}{antes:>10}{despues:>12}")
+        print(f"{'total':<24}{report['before_total_mb']:>10.2f}{report['after_total_mb']:>12.2f}")
+        print(f"columnas de results_cleaned: {report['columns_before']} -> {report['columns_after']}")
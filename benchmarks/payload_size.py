@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+
+# Bytes de cada figura en el modo normal frente al modo compacto
+# (F1_COMPACT_FIGURES=1): figura completa y parche enviado al cambiar de año.
+# Los gráficos que no dependen del año no envían nada al cambiarlo.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def measure(years):
+    os.chdir(RAIZ)
+    import plotly.io as pio
+    from plotly.utils import PlotlyJSONEncoder
+
+    import app
+    from compact import to_compact_json, year_patch
+
+    rows = []
+    for graph_id, callback, inputs in app.GRAPH_CALLBACKS:
+        all_time = app.ALL_TIME_GRAPHS.get(graph_id)
+        for year in years:
+            values = tuple(app.INPUT_CHOICES[i](year)[0] for i in inputs)
+            app.COMPACT_FIGURES = False
+            standard = pio.to_json(callback(year, *values), validate=False)
+            app.COMPACT_FIGURES = True
+            compact = to_compact_json(callback(year, *values))
+            if all_time is not None and all_time(*values):
+                patch = ""
+            else:
+                patch = json.dumps(year_patch(json.loads(compact)).to_plotly_json(), cls=PlotlyJSONEncoder, separators=(",", ":"))
+            rows.append({
+                "graph": graph_id,
+                "year": year,
+                "standard_bytes": len(standard),
+                "compact_bytes": len(compact),
+                "year_patch_bytes": len(patch),
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tamaño de las figuras en modo normal y compacto")
+    parser.add_argument("--years", type=int, nargs="+", default=[1950, 1990, 2021])
+    parser.add_argument("--json", action="store_true", help="Emitir los resultados en JSON")
+    args = parser.parse_args()
+
+    rows = measure(args.years)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        sys.exit(0)
+    print(f"{'gráfico':<28}{'año':>6}{'normal':>10}{'compacto':>10}{'parche año':>12}{'ahorro':>9}")
+    for row in rows:
+        ahorro = 1 - row["year_patch_bytes"] / row["standard_bytes"]
+        print(f"{row['graph']:<28}{row['year']:>6}{row['standard_bytes']:>10}{row['compact_bytes']:>10}"
+              f"{row['year_patch_bytes']:>12}{ahorro:>9.0%}")
+    totals = {key: sum(row[key] for row in rows) for key in ("standard_bytes", "compact_bytes", "year_patch_bytes")}
+    print(f"{'total':<30}{totals['standard_bytes']:>10}{totals['compact_bytes']:>10}{totals['year_patch_bytes']:>12}"
+          f"{1 - totals['year_patch_bytes'] / totals['standard_bytes']:>9.0%}")
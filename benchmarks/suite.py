@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark reproducible de la carga de datos y de cada callback update_*:
+# importación de app, conversión al almacén Arrow, carga de cada tabla,
+# tiempo en frío y en caliente de cada gráfico en varias temporadas (y
+# circuitos), bytes de cada figura y pico de memoria. Cada conjunto de datos
+# se mide en un proceso nuevo; con --scales se generan además datos
+# sintéticos (benchmarks/synthetic_data.py) para ver cómo escala cada camino.
+#
+#   python benchmarks/suite.py --scales 10 --json resultados.json
+#   python benchmarks/suite.py --compare antes.json resultados.json
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Tablas base y derivadas que cargan los callbacks
+TABLES = [
+    "results", "races", "drivers", "constructors", "constructor_results", "circuits",
+    "pit_stops", "driver_standings", "results_cleaned", "season_cache", "pit_stop_counts",
+    "best_lap_index", "points_evolution", "titles_by_driver", "grid_finish_histogram",
+    "qualifying", "qualifying_index", "pit_strategy", "constructor_standings", "constructor_matrix",
+    "head_to_head",
+]
+
+
+def ms_since(inicio):
+    return (time.perf_counter() - inicio) * 1000
+
+
+# Valores de los selectores adicionales a medir: el valor por defecto y, para
+# el circuito, las dos primeras carreras de la temporada
+def input_variants(app, inputs, year, circuits):
+    variants = [tuple(app.INPUT_CHOICES[i](year)[0] for i in inputs)]
+    # Los selectores de alcance también se miden en la vista de toda la historia
+    for scope in [i for i in inputs if i.endswith("-scope")]:
+        variants.append(tuple("all" if i == scope else value for i, value in zip(inputs, variants[0])))
+    if "circuit-selector" in inputs:
+        variants += [(circuit,) for circuit in app.season_circuits(year)[:circuits]]
+    return variants
+
+
+def measure(years, repeat, circuits):
+    import plotly.io as pio
+
+    inicio = time.perf_counter()
+    import app
+    report = {"import_ms": ms_since(inicio), "convert_ms": 0.0, "load_ms": {}, "callbacks": []}
+
+    # La primera lectura de cada tabla incluye su conversión a Arrow si el
+    # almacén no está al día; se mide aparte
+    from data_store import SCHEMAS, _is_fresh, convert_table
+    for name in SCHEMAS:
+        if app.registry.available(name) and not _is_fresh(name, app.ruta_base):
+            inicio = time.perf_counter()
+            convert_table(name, app.ruta_base)
+            report["convert_ms"] += ms_since(inicio)
+
+    from data_store import MissingTableError
+    for name in TABLES:
+        inicio = time.perf_counter()
+        try:
+            app.registry.get(name)
+            report["load_ms"][name] = ms_since(inicio)
+        except MissingTableError:
+            report["load_ms"][name] = None
+    report["rows"] = {
+        name: len(app.registry.get(name)) for name in app.registry.loaded()
+        if name in SCHEMAS or name == "results_cleaned"
+    }
+
+    # Callbacks sin la caché de figuras, incluida la serialización a JSON
+    for graph_id, callback, inputs in app.GRAPH_CALLBACKS:
+        for year in years:
+            for values in input_variants(app, inputs, year, circuits):
+                app.registry.get("season_cache").clear()
+                timings = []
+                size = None
+                for _ in range(repeat + 1):
+                    inicio = time.perf_counter()
+                    try:
+                        size = len(pio.to_json(callback(year, *values), validate=False))
+                    except MissingTableError as error:
+                        size = f"sin datos ({error.name})"
+                    timings.append(ms_since(inicio))
+                warm = sorted(timings[1:])
+                report["callbacks"].append({
+                    "graph": graph_id,
+                    "year": year,
+                    "inputs": dict(zip(inputs, values)),
+                    "cold_ms": timings[0],
+                    "warm_ms": warm[len(warm) // 2] if warm else None,
+                    "bytes": size,
+                })
+
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["peak_rss_mb"] = maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    return report
+
+
+def run_dataset(name, data_dir, args):
+    env = dict(os.environ, F1_DATA_DIR=data_dir)
+    env.pop("F1_FIGURE_CACHE_DIR", None)
+    command = [
+        sys.executable, __file__, "--child", "--repeat", str(args.repeat),
+        "--circuits", str(args.circuits), "--years", *map(str, args.years),
+    ]
+    output = subprocess.run(command, env=env, cwd=RAIZ, check=True, capture_output=True, text=True).stdout
+    return {"dataset": name, "data_dir": data_dir, **json.loads(output.strip().splitlines()[-1])}
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(report):
+    for dataset in report["datasets"]:
+        loaded = sum(ms for ms in dataset["load_ms"].values() if ms is not None)
+        print(f"== {dataset['dataset']}: import {dataset['import_ms']:.0f} ms, conversión {dataset['convert_ms']:.0f} ms, "
+              f"carga {loaded:.0f} ms, pico {dataset['peak_rss_mb']:.0f} MB")
+        print(f"{'gráfico':<28}{'año':>6}  {'entradas':<34}{'frío ms':>9}{'caliente ms':>13}{'bytes':>9}")
+        for row in dataset["callbacks"]:
+            inputs = ",".join(str(v) for v in row["inputs"].values())[:32]
+            warm = f"{row['warm_ms']:.1f}" if row["warm_ms"] is not None else "-"
+            print(f"{row['graph']:<28}{row['year']:>6}  {inputs:<34}{row['cold_ms']:>9.1f}{warm:>13}{str(row['bytes']):>9}")
+
+
+# Compara dos informes JSON (por ejemplo de dos revisiones): cociente
+# nuevo/antiguo del tiempo en caliente de cada medida común
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def keyed(report):
+        return {
+            (d["dataset"], row["graph"], row["year"], json.dumps(row["inputs"], sort_keys=True)): row
+            for d in report["datasets"] for row in d["callbacks"]
+        }
+
+    old_rows, new_rows = keyed(old), keyed(new)
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    print(f"{'conjunto':<10}{'gráfico':<28}{'año':>6}  {'entradas':<34}{'antes ms':>10}{'ahora ms':>10}{'ratio':>8}")
+    for key in sorted(old_rows.keys() & new_rows.keys(), key=str):
+        before, after = old_rows[key]["warm_ms"], new_rows[key]["warm_ms"]
+        if before and after:
+            inputs = ",".join(str(v) for v in json.loads(key[3]).values())[:32]
+            print(f"{key[0]:<10}{key[1]:<28}{key[2]:>6}  {inputs:<34}{before:>10.1f}{after:>10.1f}{after / before:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la carga de datos y de todos los callbacks")
+    parser.add_argument("--years", type=int, nargs="+", default=[1950, 1990, 2021])
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones en caliente por medida")
+    parser.add_argument("--circuits", type=int, default=2, help="Circuitos por temporada en mejores vueltas")
+    parser.add_argument("--scales", type=int, nargs="*", default=[],
+                        help="Escalas de datos sintéticos a medir además de ./data (p. ej. 10 100)")
+    parser.add_argument("--synthetic-dir", help="Dónde generar los datos sintéticos (por defecto, temporal)")
+    parser.add_argument("--json", help="Guardar el informe en este fichero JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "AHORA"), help="Comparar dos informes JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    if args.child:
+        print(json.dumps(measure(args.years, args.repeat, args.circuits)))
+        sys.exit(0)
+
+    from benchmarks.synthetic_data import generate
+
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "years": args.years,
+        "datasets": [run_dataset("x1", os.path.join(RAIZ, "data"), args)],
+    }
+    with tempfile.TemporaryDirectory() as temporal:
+        for scale in args.scales:
+            data_dir = os.path.join(args.synthetic_dir or temporal, f"x{scale}")
+            inicio = time.perf_counter()
+            generate(scale, data_dir)
+            print(f"datos sintéticos x{scale} en {time.perf_counter() - inicio:.0f}s", file=sys.stderr)
+            report["datasets"].append({"scale": scale, **run_dataset(f"x{scale}", data_dir, args)})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    summarize(report)
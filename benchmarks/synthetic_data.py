@@ -0,0 +1,113 @@
+import argparse
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Generador de datos sintéticos a escala: cada carrera de ./data se replica
+# `scale` veces dentro de su misma temporada (raceId y claves primarias
+# desplazados), junto con todas sus filas de results, pit_stops, lap_times,
+# qualifying, standings... Así cada temporada tiene `scale` veces más filas y
+# los datos siguen siendo coherentes entre tablas. Si no hay lap_times.csv se
+# genera uno a partir de results (una fila por vuelta completada desde 1996,
+# como el lap_times original de Ergast: ~600k filas a escala 1).
+#
+#   python benchmarks/synthetic_data.py --scale 10 --out /tmp/f1x10
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from timefmt import format_milliseconds, parse_time_ms  # noqa: E402
+
+# Tablas con una fila por carrera (o por carrera y piloto/equipo) y su clave
+# primaria propia, si la tienen
+RACE_TABLES = {
+    "races": "raceId",
+    "results": "resultId",
+    "sprint_results": "resultId",
+    "qualifying": "qualifyId",
+    "driver_standings": "driverStandingsId",
+    "constructor_standings": "constructorStandingsId",
+    "constructor_results": "constructorResultsId",
+    "pit_stops": None,
+    "lap_times": None,
+}
+
+
+def read_raw(ruta, name):
+    # Todo como texto para reescribir los CSV sin alterar sus formatos
+    return pd.read_csv(f"{ruta}/{name}.csv", dtype=str, keep_default_na=False)
+
+
+# Una fila por vuelta completada de cada resultado, con tiempos alrededor de
+# la vuelta rápida del piloto (o 90 s si no consta)
+def synthesize_lap_times(results, races, first_year=1996, seed=0):
+    race_ids = races.loc[pd.to_numeric(races["year"]) >= first_year, "raceId"]
+    results = results[results["raceId"].isin(race_ids)]
+    laps = pd.to_numeric(results["laps"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+    base = parse_time_ms(results["fastestLapTime"].replace("\\N", None).to_numpy())
+    base = np.where(np.isnan(base), 90000, base)
+
+    rows = np.repeat(np.arange(len(results)), laps)
+    lap = np.arange(len(rows)) - np.repeat(np.cumsum(laps) - laps, laps) + 1
+    rng = np.random.default_rng(seed)
+    milliseconds = (base[rows] * (1 + rng.random(len(rows)) * 0.05)).astype(np.int64)
+    positions = pd.to_numeric(results["positionOrder"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+    return pd.DataFrame({
+        "raceId": results["raceId"].to_numpy()[rows],
+        "driverId": results["driverId"].to_numpy()[rows],
+        "lap": lap,
+        "position": positions[rows],
+        "time": np.char.replace(format_milliseconds(milliseconds).astype(str), ",", "."),
+        "milliseconds": milliseconds,
+    }).astype(str)
+
+
+def scale_table(df, name, scale, race_offset):
+    if scale == 1:
+        return df
+    copies = []
+    key = RACE_TABLES[name]
+    key_offset = pd.to_numeric(df[key]).max() if key and key != "raceId" else 0
+    for k in range(scale):
+        copy = df.copy()
+        copy["raceId"] = (pd.to_numeric(copy["raceId"]) + k * race_offset).astype(str)
+        if key and key != "raceId":
+            copy[key] = (pd.to_numeric(copy[key]) + k * key_offset).astype(str)
+        if name == "races":
+            # Las réplicas se intercalan con la carrera original
+            copy["round"] = ((pd.to_numeric(copy["round"]) - 1) * scale + k + 1).astype(str)
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def generate(scale, out, source=os.path.join(RAIZ, "data"), lap_times=True):
+    os.makedirs(out, exist_ok=True)
+    race_offset = pd.to_numeric(read_raw(source, "races")["raceId"]).max()
+    rows = {}
+    for filename in sorted(os.listdir(source)):
+        if not filename.endswith(".csv"):
+            continue
+        name = filename[:-4]
+        if name not in RACE_TABLES:
+            shutil.copyfile(os.path.join(source, filename), os.path.join(out, filename))
+            continue
+        df = scale_table(read_raw(source, name), name, scale, race_offset)
+        df.to_csv(os.path.join(out, filename), index=False)
+        rows[name] = len(df)
+    if lap_times and not os.path.exists(os.path.join(source, "lap_times.csv")):
+        df = scale_table(synthesize_lap_times(read_raw(source, "results"), read_raw(source, "races")), "lap_times", scale, race_offset)
+        df.to_csv(os.path.join(out, "lap_times.csv"), index=False)
+        rows["lap_times"] = len(df)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un ./data sintético con más carreras por temporada")
+    parser.add_argument("--scale", type=int, default=10, help="Réplicas de cada carrera")
+    parser.add_argument("--out", required=True, help="Directorio de salida")
+    parser.add_argument("--no-lap-times", action="store_true", help="No generar lap_times.csv si falta")
+    args = parser.parse_args()
+    for name, count in generate(args.scale, args.out, lap_times=not args.no_lap_times).items():
+        print(f"{name}: {count} filas")
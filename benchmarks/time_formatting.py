@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Microbenchmark del formateo/parseo de tiempos: versión por fila (apply con
+# una función Python, como hacía app.py) frente a timefmt, a tamaños del
+# dataset completo de Ergast (~600k vueltas en lap_times).
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from timefmt import format_milliseconds, parse_time, parse_time_ms  # noqa: E402
+
+
+def format_time(milliseconds):
+    minutes = milliseconds // 60000
+    seconds = (milliseconds % 60000) // 1000
+    millis = milliseconds % 1000
+    return f"{minutes}:{seconds:02d},{millis:03d}"
+
+
+def best_of(fn, repeat):
+    tiempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos) * 1000
+
+
+def time_strings(rows):
+    ruta = os.path.join(RAIZ, "data")
+    results = pd.read_csv(f"{ruta}/results.csv", na_values=["\\N"])
+    qualifying = pd.read_csv(f"{ruta}/qualifying.csv", na_values=["\\N"])
+    strings = pd.concat([
+        results["time"], results["fastestLapTime"],
+        qualifying["q1"], qualifying["q2"], qualifying["q3"],
+    ], ignore_index=True)
+    return pd.Series(np.resize(strings.to_numpy(dtype=object), rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark de formateo y parseo de tiempos")
+    parser.add_argument("--rows", type=int, default=600_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Emitir los resultados en JSON")
+    args = parser.parse_args()
+
+    milliseconds = pd.Series(np.random.default_rng(0).integers(60_000, 130_000, args.rows))
+    strings = time_strings(args.rows)
+
+    assert list(format_milliseconds(milliseconds[:1000])) == list(milliseconds[:1000].apply(format_time))
+    assert np.allclose(parse_time_ms(strings[:1000]), strings[:1000].apply(parse_time), equal_nan=True)
+
+    results = {
+        "rows": args.rows,
+        "format_apply_ms": best_of(lambda: milliseconds.apply(format_time), args.repeat),
+        "format_vectorized_ms": best_of(lambda: format_milliseconds(milliseconds), args.repeat),
+        "parse_apply_ms": best_of(lambda: strings.apply(parse_time), args.repeat),
+        "parse_vectorized_ms": best_of(lambda: parse_time_ms(strings), args.repeat),
+    }
+    results["format_speedup"] = results["format_apply_ms"] / results["format_vectorized_ms"]
+    results["parse_speedup"] = results["parse_apply_ms"] / results["parse_vectorized_ms"]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"filas: {args.rows}")
+        print(f"formateo  apply={results['format_apply_ms']:8.1f} ms  vectorizado={results['format_vectorized_ms']:8.1f} ms  x{results['format_speedup']:.1f}")
+        print(f"parseo    apply={results['parse_apply_ms']:8.1f} ms  vectorizado={results['parse_vectorized_ms']:8.1f} ms  x{results['parse_speedup']:.1f}")
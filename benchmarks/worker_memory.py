@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import psutil
+
+# Memoria de un despliegue gunicorn con y sin precarga (F1_PRELOAD=1). Arranca
+# el servidor, recorre todos los gráficos de varias temporadas con suficientes
+# peticiones para que pasen por todos los workers y mide la memoria
+# proporcional (PSS, reparte las páginas compartidas) y la exclusiva (USS) del
+# maestro y de cada worker.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.batched_callbacks import dependency_payload  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=120):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} no responde")
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    return urllib.request.urlopen(request, timeout=120).read()
+
+
+def exercise(base_url, years, rounds):
+    urllib.request.urlopen(base_url + "/").read()
+    dependencies = json.loads(urllib.request.urlopen(base_url + "/_dash-dependencies").read())
+    dependencies = [d for d in dependencies if any(i["id"] == "year-selector" for i in d["inputs"])]
+    for _ in range(rounds):
+        for year in years:
+            for dependency in dependencies:
+                post_json(base_url + "/_dash-update-component", dependency_payload(dependency, {"year-selector": year}))
+
+
+def memory(process):
+    info = process.memory_full_info()
+    return {"pid": process.pid, "rss_mb": info.rss / 2**20, "pss_mb": info.pss / 2**20, "uss_mb": info.uss / 2**20}
+
+
+def measure(preload, workers, years, rounds):
+    port = free_port()
+    env = dict(os.environ, F1_PRELOAD="1" if preload else "0")
+    env.pop("F1_FIGURE_CACHE_DIR", None)
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "wsgi:server", "--workers", str(workers),
+         "--bind", f"127.0.0.1:{port}", "--timeout", "300"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        inicio = time.perf_counter()
+        wait_until_ready(base_url + "/metrics")
+        ready_s = time.perf_counter() - inicio
+        exercise(base_url, years, rounds)
+        process = psutil.Process(master.pid)
+        children = process.children()
+        return {
+            "preload": preload,
+            "workers": len(children),
+            "ready_s": ready_s,
+            "master": memory(process),
+            "children": [memory(child) for child in children],
+            "total_pss_mb": memory(process)["pss_mb"] + sum(memory(child)["pss_mb"] for child in children),
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria de los workers de gunicorn con y sin precarga")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--years", type=int, nargs="+", default=[1950, 1990, 2021])
+    parser.add_argument("--rounds", type=int, default=3, help="Vueltas de peticiones por temporada")
+    parser.add_argument("--json", action="store_true", help="Emitir los resultados en JSON")
+    args = parser.parse_args()
+
+    results = [measure(preload, args.workers, args.years, args.rounds) for preload in (False, True)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        sys.exit(0)
+    for result in results:
+        workers = result["children"]
+        print(f"precarga={'sí' if result['preload'] else 'no':<3} workers={result['workers']} "
+              f"listo en {result['ready_s']:.1f}s  PSS total={result['total_pss_mb']:.0f} MB  "
+              f"maestro PSS={result['master']['pss_mb']:.0f} MB  "
+              f"worker PSS medio={sum(w['pss_mb'] for w in workers) / len(workers):.0f} MB  "
+              f"USS medio={sum(w['uss_mb'] for w in workers) / len(workers):.0f} MB")
@@ -0,0 +1,45 @@
+import pandas as pd
+
+
+# Vuelta más rápida de cada piloto en cada carrera, calculada una sola vez. Si
+# existe lap_times se toma el mínimo de sus vueltas; si no, la vuelta rápida
+# de results (fastestLapTime ya convertido a ms en el almacén, sólo desde
+# 2004). Las series por (temporada, carrera) y por temporada completa se
+# guardan ordenadas, así que el callback es una búsqueda en un diccionario.
+def race_best_laps(lap_times=None, results=None):
+    if lap_times is not None:
+        return lap_times.groupby(["raceId", "driverId"])["milliseconds"].min().reset_index()
+    best_laps = results[["raceId", "driverId", "fastestLapTime_ms"]].dropna()
+    best_laps = best_laps.rename(columns={"fastestLapTime_ms": "milliseconds"})
+    return best_laps.astype({"milliseconds": "int32"}).groupby(["raceId", "driverId"])["milliseconds"].min().reset_index()
+
+
+class BestLapIndex:
+    def __init__(self, best_laps, races, source):
+        self.source = source  # "lap_times" o "results"
+        self._laps = {}
+        self.add(best_laps, races)
+
+    # Añade carreras nuevas (raceIds que aún no están en el índice) y recalcula
+    # el mínimo de la temporada sólo en los años afectados
+    def add(self, best_laps, races):
+        best_laps = best_laps.merge(races[["raceId", "year", "name"]], on="raceId")
+        best_laps["name"] = best_laps["name"].astype(str)
+        for year, season in best_laps.groupby("year"):
+            year = int(year)
+            for name, race in season.groupby("name"):
+                self._laps[(year, name)] = self._sorted(race)
+            previous = self._laps.get((year, None))
+            season_laps = self._sorted(season)
+            if previous is not None:
+                season_laps = pd.concat([previous, season_laps]).groupby(level=0).min().sort_values()
+            self._laps[(year, None)] = season_laps
+        return self
+
+    def get(self, year, circuit=None):
+        laps = self._laps.get((year, circuit or None))
+        return laps if laps is not None else pd.Series(dtype="int32", name="milliseconds", index=pd.Index([], name="driverId"))
+
+    @staticmethod
+    def _sorted(rows):
+        return rows.groupby("driverId")["milliseconds"].min().sort_values()
@@ -0,0 +1,73 @@
+import base64
+import json
+
+from dash import Patch
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+
+# Modo compacto de las figuras (F1_COMPACT_FIGURES=1): los arrays numéricos de
+# las trazas se envían como typed arrays de plotly.js ({"dtype", "bdata"} en
+# base64, con el tipo más pequeño que conserva los valores) en lugar de listas
+# JSON, y un cambio de año sólo envía un Patch con las trazas y el layout sin
+# la plantilla, que el navegador ya tiene.
+
+# Atributos de traza que se codifican si son arrays numéricos
+TYPED_ATTRIBUTES = ("x", "y", "z", "lat", "lon", "values", "marker.color")
+
+INTEGER_DTYPES = [(np.int8, "i1"), (np.uint8, "u1"), (np.int16, "i2"), (np.uint16, "u2"), (np.int32, "i4")]
+
+
+def typed_array(values):
+    array = np.asarray(values)
+    if array.dtype.kind not in "iufb" or array.size == 0:
+        return values
+    if array.dtype.kind == "b":
+        array = array.astype(np.uint8)
+    if array.dtype.kind == "f":
+        finite = np.isfinite(array)
+        integral = finite.all() and np.array_equal(array, np.round(array))
+    else:
+        integral = True
+    if integral:
+        low, high = array.min(), array.max()
+        for dtype, code in INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return encode(array.astype(dtype), code, array.shape)
+    return encode(array.astype(np.float32), "f4", array.shape)
+
+
+def encode(array, code, shape):
+    spec = {"dtype": code, "bdata": base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")}
+    if len(shape) > 1:
+        spec["shape"] = ", ".join(str(n) for n in shape)
+    return spec
+
+
+def compact_traces(figure):
+    for trace in figure.get("data", []):
+        for attribute in TYPED_ATTRIBUTES:
+            parent, _, name = attribute.rpartition(".")
+            container = trace.get(parent) if parent else trace
+            if isinstance(container, dict) and isinstance(container.get(name), (np.ndarray, list, tuple)):
+                container[name] = typed_array(container[name])
+    return figure
+
+
+def to_compact_json(fig):
+    return json.dumps(compact_traces(fig.to_plotly_json()), cls=PlotlyJSONEncoder, separators=(",", ":"))
+
+
+# Parche para un cambio de año: se sustituyen las trazas y cada clave del
+# layout salvo la plantilla (~7,5 KB por figura). Las anotaciones se vacían
+# si la figura nueva no tiene, por si la anterior era un aviso de datos
+def year_patch(figure):
+    patch = Patch()
+    patch["data"] = figure["data"]
+    for key, value in figure["layout"].items():
+        if key != "template":
+            patch["layout"][key] = value
+    if "annotations" not in figure["layout"]:
+        patch["layout"]["annotations"] = []
+    return patch
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from season_cache import final_round_rows
+
+
+# Matriz densa equipo x temporada con los puntos de cada equipo (suma de
+# constructor_results) y su posición final en el campeonato (standings tras la
+# última carrera del calendario, 0 si no consta o la temporada no ha
+# terminado), calculada una sola vez. Una temporada es una columna: el gráfico
+# de una temporada cuesta O(equipos) y la comparación entre épocas usa la
+# matriz completa.
+class ConstructorSeasonMatrix:
+    def __init__(self, constructor_results, races, constructor_standings=None):
+        race_years = races.set_index("raceId")["year"]
+        years = race_years.reindex(constructor_results["raceId"]).to_numpy()
+        known = ~pd.isna(years)
+        team_ids = constructor_results["constructorId"].to_numpy()[known]
+        years = years[known].astype(np.int64)
+
+        self.constructor_ids = np.unique(team_ids)
+        self.years = np.unique(years)
+        shape = (len(self.constructor_ids), len(self.years))
+        rows = np.searchsorted(self.constructor_ids, team_ids)
+        columns = np.searchsorted(self.years, years)
+        flat = np.ravel_multi_index((rows, columns), shape)
+        size = int(np.prod(shape))
+
+        self.points = np.bincount(flat, weights=constructor_results["points"].to_numpy(dtype=np.float64)[known],
+                                  minlength=size).astype(np.float32).reshape(shape)
+        # Equipos que disputaron alguna carrera de la temporada (aunque no puntuaran)
+        self.entered = (np.bincount(flat, minlength=size) > 0).reshape(shape)
+        self.positions = np.zeros(shape, dtype=np.int16)
+        if constructor_standings is not None:
+            self._set_positions(constructor_standings, races)
+
+    # Clasificación tras la última carrera del calendario de cada temporada;
+    # las temporadas cuya última carrera aún no tiene standings quedan a 0
+    def _set_positions(self, constructor_standings, races):
+        standings = constructor_standings[["raceId", "constructorId", "position"]].merge(
+            races[["raceId", "year", "round"]], on="raceId"
+        )
+        final = standings[final_round_rows(standings, races)
+                          & standings["constructorId"].isin(self.constructor_ids)
+                          & standings["year"].isin(self.years)]
+        rows = np.searchsorted(self.constructor_ids, final["constructorId"].to_numpy())
+        columns = np.searchsorted(self.years, final["year"].to_numpy())
+        self.positions[rows, columns] = final["position"].to_numpy()
+
+    # Equipos de una temporada: constructorId, points, position (orden por puntos)
+    def season(self, year):
+        column = np.searchsorted(self.years, year)
+        if column == len(self.years) or self.years[column] != year:
+            return pd.DataFrame({"constructorId": [], "points": [], "position": []})
+        teams = np.flatnonzero(self.entered[:, column])
+        order = teams[np.argsort(-self.points[teams, column], kind="stable")]
+        return pd.DataFrame({
+            "constructorId": self.constructor_ids[order],
+            "points": self.points[order, column],
+            "position": self.positions[order, column],
+        })
+
+    # Porcentaje de los puntos de cada temporada que logró cada equipo, para
+    # comparar épocas con sistemas de puntuación distintos
+    def points_share(self):
+        totals = self.points.sum(axis=0)
+        return np.divide(self.points * 100, totals, out=np.zeros_like(self.points), where=totals > 0)
@@ -0,0 +1,540 @@
+import argparse
+import contextlib
+import csv
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import pandas as pd
+import pyarrow as pa
+
+from timefmt import parse_time_ms
+
+
+# Almacén columnar (Arrow IPC sin comprimir) que sustituye a pd.read_csv al
+# arrancar. Cada tabla se convierte una sola vez con tipos explícitos y se
+# lee con memory-map; sólo se reconstruye cuando cambia el CSV de origen.
+RUTA_ALMACEN = ".arrow"
+
+SCHEMAS = {
+    "results": {
+        "resultId": "int32", "raceId": "int32", "driverId": "int32", "constructorId": "int32",
+        "number": "float32", "grid": "int16", "position": "float32", "positionText": "category",
+        "positionOrder": "int16", "points": "float32", "laps": "int16", "time": "str",
+        "milliseconds": "float64", "fastestLap": "float32", "rank": "float32",
+        "fastestLapTime": "str", "fastestLapSpeed": "float32", "statusId": "int16",
+    },
+    "drivers": {
+        "driverId": "int32", "driverRef": "str", "number": "float32", "code": "category",
+        "forename": "str", "surname": "category", "dob": "str", "nationality": "category",
+        "url": "str",
+    },
+    "races": {
+        "raceId": "int32", "year": "int16", "round": "int16", "circuitId": "int32",
+        "name": "category", "date": "str", "time": "str", "url": "str",
+        "fp1_date": "str", "fp1_time": "str", "fp2_date": "str", "fp2_time": "str",
+        "fp3_date": "str", "fp3_time": "str", "quali_date": "str", "quali_time": "str",
+        "sprint_date": "str", "sprint_time": "str",
+    },
+    "constructors": {
+        "constructorId": "int32", "constructorRef": "str", "name": "category",
+        "nationality": "category", "url": "str",
+    },
+    "constructor_results": {
+        "constructorResultsId": "int32", "raceId": "int32", "constructorId": "int32",
+        "points": "float32", "status": "category",
+    },
+    "lap_times": {
+        "raceId": "int32", "driverId": "int32", "lap": "int16", "position": "int16",
+        "time": "str", "milliseconds": "int32",
+    },
+    "pit_stops": {
+        "raceId": "int32", "driverId": "int32", "stop": "int8", "lap": "int16",
+        "time": "str", "duration": "str", "milliseconds": "int32",
+    },
+    "driver_standings": {
+        "driverStandingsId": "int32", "raceId": "int32", "driverId": "int32", "points": "float32",
+        "position": "int16", "positionText": "category", "wins": "int16",
+    },
+    "constructor_standings": {
+        "constructorStandingsId": "int32", "raceId": "int32", "constructorId": "int32", "points": "float32",
+        "position": "int16", "positionText": "category", "wins": "int16",
+    },
+    "qualifying": {
+        "qualifyId": "int32", "raceId": "int32", "driverId": "int32", "constructorId": "int32",
+        "number": "int16", "position": "int16", "q1": "str", "q2": "str", "q3": "str",
+    },
+    "circuits": {
+        "circuitId": "int32", "circuitRef": "str", "name": "category", "location": "str",
+        "country": "category", "lat": "float64", "lng": "float64", "alt": "float32",
+        "url": "str",
+    },
+}
+
+
+# Columnas de tiempo en texto que se convierten a milisegundos enteros una
+# sola vez durante la conversión (columna "<col>_ms", Int32 con nulos). En
+# results, time_ms es el tiempo total del ganador y la diferencia con él para
+# el resto ("+5.478"); el tiempo total de cada piloto ya está en milliseconds
+TIME_COLUMNS = {
+    "results": ["time", "fastestLapTime"],
+    "qualifying": ["q1", "q2", "q3"],
+}
+
+
+def _schema_hash(name):
+    declared = {"schema": SCHEMAS[name], "time_columns": TIME_COLUMNS.get(name, [])}
+    return hashlib.sha1(json.dumps(declared, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def store_path(name, ruta_base):
+    return os.path.join(ruta_base, RUTA_ALMACEN, f"{name}.arrow")
+
+
+def add_time_columns(name, df):
+    for col in TIME_COLUMNS.get(name, []):
+        df[f"{col}_ms"] = pd.array(parse_time_ms(df[col].to_numpy()), dtype="Int32")
+    return df
+
+
+def read_csv_typed(name, ruta_base):
+    dtypes = {col: (object if dtype == "str" else dtype) for col, dtype in SCHEMAS[name].items()}
+    df = pd.read_csv(f"{ruta_base}/{name}.csv", dtype=dtypes, na_values=["\\N"])
+    return add_time_columns(name, df)
+
+
+def _write_arrow(table, destino):
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Escritura atómica: los workers que ya tienen el fichero mapeado siguen
+    # leyendo la versión anterior hasta que lo vuelvan a abrir.
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    with pa.OSFile(temporal, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temporal, destino)
+    return destino
+
+
+def _with_metadata(table, name, csv_path, generation):
+    return table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"f1.source": _source_signature(csv_path).encode(),
+        b"f1.schema": _schema_hash(name).encode(),
+        b"f1.generation": str(generation).encode(),
+    })
+
+
+def convert_table(name, ruta_base):
+    csv_path = f"{ruta_base}/{name}.csv"
+    table = pa.Table.from_pandas(read_csv_typed(name, ruta_base), preserve_index=False)
+    generation = read_ingest_log(ruta_base)["generation"]
+    return _write_arrow(_with_metadata(table, name, csv_path, generation), store_path(name, ruta_base))
+
+
+def _is_fresh(name, ruta_base):
+    destino = store_path(name, ruta_base)
+    if not os.path.exists(destino):
+        return False
+    csv_path = f"{ruta_base}/{name}.csv"
+    with pa.memory_map(destino, "r") as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    if metadata.get(b"f1.schema") != _schema_hash(name).encode():
+        return False
+    if not os.path.exists(csv_path):
+        # Sin CSV de origen el almacén es la única copia disponible
+        return True
+    return metadata.get(b"f1.source") == _source_signature(csv_path).encode()
+
+
+def read_arrow(name, ruta_base):
+    source = pa.memory_map(store_path(name, ruta_base), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def table_generation(table):
+    return int((table.schema.metadata or {}).get(b"f1.generation", b"0"))
+
+
+# Bloqueo entre procesos del almacén: las lecturas/conversiones toman un
+# bloqueo compartido y una ingesta incremental uno exclusivo
+@contextlib.contextmanager
+def store_lock(ruta_base, exclusive=False):
+    if fcntl is None:
+        yield
+        return
+    path = os.path.join(ruta_base, RUTA_ALMACEN, ".lock")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_arrow(name, ruta_base):
+    with store_lock(ruta_base):
+        if not _is_fresh(name, ruta_base):
+            convert_table(name, ruta_base)
+        return read_arrow(name, ruta_base)
+
+
+# Concatena filas nuevas manteniendo las columnas categóricas (pd.concat las
+# convertiría a object si las categorías no coinciden)
+def concat_rows(current, new):
+    new = new[list(current.columns)]
+    current_cols, new_cols = {}, {}
+    for col in current.columns:
+        if isinstance(current[col].dtype, pd.CategoricalDtype):
+            categories = current[col].cat.categories.union(new[col].astype("category").cat.categories, sort=False)
+            current_cols[col] = current[col].cat.set_categories(categories)
+            new_cols[col] = new[col].astype(pd.CategoricalDtype(categories))
+    if current_cols:
+        current = current.assign(**current_cols)
+        new = new.assign(**new_cols)
+    return pd.concat([current, new], ignore_index=True)
+
+
+# Ingesta incremental: las filas nuevas (sólo raceIds nuevos) se añaden a los
+# CSV y al almacén, y se publican como un lote numerado en ingest.json para
+# que los workers en marcha las apliquen sin reiniciar ni recalcular todo.
+INGEST_LOG = "ingest.json"
+
+
+@dataclass(frozen=True)
+class IngestBatch:
+    generation: int
+    tables: dict        # nombre -> DataFrame con sólo las filas nuevas
+    years: frozenset    # temporadas afectadas
+    data_version: str   # versión de los datos tras la ingesta
+
+
+def ingest_log_path(ruta_base):
+    return os.path.join(ruta_base, RUTA_ALMACEN, INGEST_LOG)
+
+
+def read_ingest_log(ruta_base):
+    try:
+        with open(ingest_log_path(ruta_base), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"generation": 0, "batches": []}
+
+
+def _write_json_atomic(path, value):
+    temporal = f"{path}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(value, f, indent=2)
+    os.replace(temporal, path)
+
+
+def batch_path(name, generation, ruta_base):
+    return os.path.join(ruta_base, RUTA_ALMACEN, "ingest", str(generation), f"{name}.arrow")
+
+
+def load_batch(ruta_base, meta):
+    tables = {}
+    for name in meta["tables"]:
+        source = pa.memory_map(batch_path(name, meta["generation"], ruta_base), "r")
+        tables[name] = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+    return IngestBatch(meta["generation"], tables, frozenset(meta["years"]), meta["data_version"])
+
+
+# Con las líneas originales del CSV de entrada se copian tal cual; si no, se
+# serializan las filas tipadas
+def _append_csv(csv_path, rows, lines=None):
+    exists = os.path.exists(csv_path)
+    if exists and os.path.getsize(csv_path) > 0:
+        with open(csv_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                with open(csv_path, "ab") as out:
+                    out.write(b"\n")
+    if lines is None:
+        rows.to_csv(csv_path, mode="a", header=not exists, index=False, na_rep="\\N",
+                    quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+        return
+    with open(csv_path, "a", encoding="utf-8") as f:
+        if not exists:
+            f.write(",".join(rows.columns) + "\n")
+        f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+
+
+def append_table(name, new_rows, ruta_base, generation, lines=None):
+    csv_path = f"{ruta_base}/{name}.csv"
+    existing = None
+    if os.path.exists(csv_path) or os.path.exists(store_path(name, ruta_base)):
+        if not _is_fresh(name, ruta_base):
+            convert_table(name, ruta_base)
+        existing = read_arrow(name, ruta_base)
+
+    _append_csv(csv_path, new_rows[list(SCHEMAS[name])], lines)
+    new_table = pa.Table.from_pandas(new_rows, preserve_index=False)
+    if existing is None:
+        table = new_table
+    else:
+        # El formato de fichero IPC exige un único diccionario por columna
+        table = pa.concat_tables([existing, new_table.cast(existing.schema)]).unify_dictionaries()
+    _write_arrow(_with_metadata(table, name, csv_path, generation), store_path(name, ruta_base))
+
+
+def _existing_ids(name, column, ruta_base):
+    if not (os.path.exists(f"{ruta_base}/{name}.csv") or os.path.exists(store_path(name, ruta_base))):
+        return set()
+    if not _is_fresh(name, ruta_base):
+        convert_table(name, ruta_base)
+    return set(read_arrow(name, ruta_base).column(column).unique().to_pylist())
+
+
+# Claves que identifican las filas nuevas de cada tabla: para las tablas de
+# resultados, raceIds que todavía no tienen filas; para las dimensiones, ids nuevos
+INGEST_KEYS = {
+    "results": "raceId", "constructor_results": "raceId", "lap_times": "raceId",
+    "pit_stops": "raceId", "qualifying": "raceId", "driver_standings": "raceId", "constructor_standings": "raceId",
+    "races": "raceId", "drivers": "driverId", "constructors": "constructorId",
+    "circuits": "circuitId",
+}
+
+
+# Lee los CSV de filas nuevas de un directorio (misma cabecera que ./data) y
+# devuelve las tablas tipadas junto con sus líneas originales
+def read_ingest_directory(directory):
+    new_tables, csv_lines = {}, {}
+    for name in INGEST_KEYS:
+        path = os.path.join(directory, f"{name}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            header, *lines = [line for line in f if line.strip()]
+        if header.strip().replace('"', "").split(",") != list(SCHEMAS[name]):
+            raise ValueError(f"{path}: la cabecera no coincide con {name}.csv")
+        new_tables[name] = read_csv_typed(name, directory)
+        csv_lines[name] = lines
+    return new_tables, csv_lines
+
+
+def ingest_tables(ruta_base, new_tables, csv_lines=None):
+    csv_lines = csv_lines or {}
+    unknown = set(new_tables) - set(INGEST_KEYS)
+    if unknown:
+        raise ValueError(f"Tablas no admitidas en la ingesta: {sorted(unknown)}")
+
+    with store_lock(ruta_base, exclusive=True):
+        for name, rows in new_tables.items():
+            key = INGEST_KEYS[name]
+            repeated = set(rows[key].unique().tolist()) & _existing_ids(name, key, ruta_base)
+            if repeated:
+                raise ValueError(f"{name}: {key} ya presentes en los datos: {sorted(repeated)[:10]}")
+
+        # Temporadas afectadas, a partir de las carreras nuevas o existentes
+        race_years = {}
+        if os.path.exists(store_path("races", ruta_base)) or os.path.exists(f"{ruta_base}/races.csv"):
+            if not _is_fresh("races", ruta_base):
+                convert_table("races", ruta_base)
+            races = read_arrow("races", ruta_base)
+            race_years = dict(zip(races.column("raceId").to_pylist(), races.column("year").to_pylist()))
+        if "races" in new_tables:
+            race_years.update(zip(new_tables["races"]["raceId"].tolist(), new_tables["races"]["year"].tolist()))
+        years = set()
+        for name, rows in new_tables.items():
+            if "raceId" in rows.columns:
+                missing = set(rows["raceId"].unique().tolist()) - set(race_years)
+                if missing:
+                    raise ValueError(f"{name}: raceIds sin carrera en races: {sorted(missing)[:10]}")
+                years.update(int(race_years[race_id]) for race_id in rows["raceId"].unique().tolist())
+
+        log = read_ingest_log(ruta_base)
+        generation = log["generation"] + 1
+        for name, rows in new_tables.items():
+            _write_arrow(pa.Table.from_pandas(rows, preserve_index=False), batch_path(name, generation, ruta_base))
+        for name, rows in new_tables.items():
+            append_table(name, rows, ruta_base, generation, csv_lines.get(name))
+
+        meta = {
+            "generation": generation,
+            "tables": sorted(new_tables),
+            "rows": {name: len(rows) for name, rows in new_tables.items()},
+            "years": sorted(years),
+            "data_version": data_version(ruta_base),
+        }
+        log["generation"] = generation
+        log["batches"].append(meta)
+        _write_json_atomic(ingest_log_path(ruta_base), log)
+    return meta
+
+
+# Versión de los datos: cambia cuando cambia cualquier CSV o el esquema
+# declarado de alguna tabla
+def data_version(ruta_base):
+    firma = hashlib.sha1()
+    for name in sorted(SCHEMAS):
+        csv_path = f"{ruta_base}/{name}.csv"
+        if os.path.exists(csv_path):
+            firma.update(f"{name}={_source_signature(csv_path)}:{_schema_hash(name)};".encode())
+    return firma.hexdigest()[:12]
+
+
+class MissingTableError(FileNotFoundError):
+    def __init__(self, name):
+        super().__init__(f"No se encuentra la tabla '{name}' ({name}.csv)")
+        self.name = name
+
+
+class DataRegistry:
+    # Registro de tablas cargadas bajo demanda: cada tabla (o tabla derivada)
+    # se carga la primera vez que un callback la pide y queda en memoria. Si
+    # falta el origen se lanza MissingTableError sin cachear el fallo, de modo
+    # que la tabla se cargará en cuanto el fichero aparezca.
+    #
+    # Las ingestas incrementales publicadas en ingest.json se aplican con
+    # refresh(): las tablas base cargadas reciben las filas nuevas y cada tabla
+    # derivada se actualiza con su "appender" (o se descarta para reconstruirse
+    # bajo demanda si no tiene).
+    def __init__(self, ruta_base):
+        self.ruta_base = ruta_base
+        self._tables = {}
+        self._builders = {}
+        self._appenders = {}
+        self._batches = {}
+        self._lock = threading.RLock()
+        self.generation = read_ingest_log(ruta_base)["generation"]
+        self._log_mtime = self._ingest_log_mtime()
+
+    def derived(self, name):
+        def register(builder):
+            self._builders[name] = builder
+            return builder
+        return register
+
+    def appender(self, name):
+        def register(appender):
+            self._appenders[name] = appender
+            return appender
+        return register
+
+    def available(self, name):
+        if name in self._builders:
+            return True
+        return os.path.exists(f"{self.ruta_base}/{name}.csv") or os.path.exists(store_path(name, self.ruta_base))
+
+    def loaded(self):
+        return sorted(self._tables)
+
+    # Carga todas las tablas derivadas (y las tablas base de las que dependen)
+    # de una vez, omitiendo las que no tienen origen disponible
+    def preload(self):
+        missing = []
+        for name in list(self._builders):
+            try:
+                self.get(name)
+            except MissingTableError as error:
+                missing.append(error.name)
+        return missing
+
+    def get(self, name):
+        table = self._tables.get(name)
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = self._load(name)
+                self._tables[name] = table
+        return table
+
+    def _load(self, name):
+        if name in self._builders:
+            return self._builders[name](self)
+        if not self.available(name):
+            raise MissingTableError(name)
+        arrow = load_arrow(name, self.ruta_base)
+        generation = table_generation(arrow)
+        if generation > self.generation:
+            self._refresh()
+        table = arrow.to_pandas(split_blocks=True)
+        # Lotes ya aplicados al resto de tablas pero no incluidos en este fichero
+        for pending in range(generation + 1, self.generation + 1):
+            batch = self._batch(pending)
+            if name in batch.tables:
+                table = concat_rows(table, batch.tables[name])
+        return table
+
+    def _ingest_log_mtime(self):
+        try:
+            return os.stat(ingest_log_path(self.ruta_base)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _batch(self, generation):
+        batch = self._batches.get(generation)
+        if batch is None:
+            meta = next(m for m in read_ingest_log(self.ruta_base)["batches"] if m["generation"] == generation)
+            batch = self._batches[generation] = load_batch(self.ruta_base, meta)
+        return batch
+
+    def refresh(self):
+        # Sólo un stat por llamada mientras no haya ingestas nuevas
+        if self._ingest_log_mtime() == self._log_mtime:
+            return []
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        self._log_mtime = self._ingest_log_mtime()
+        applied = []
+        for meta in read_ingest_log(self.ruta_base)["batches"]:
+            if meta["generation"] > self.generation:
+                batch = self._batch(meta["generation"])
+                self._apply(batch)
+                applied.append(batch)
+        return applied
+
+    def _apply(self, batch):
+        for name in list(self._tables):
+            if name not in self._builders and name in batch.tables:
+                self._tables[name] = concat_rows(self._tables[name], batch.tables[name])
+        self.generation = batch.generation
+        # Las derivadas en orden de registro, para que cada appender vea ya
+        # actualizadas las tablas de las que depende
+        for name in self._builders:
+            if name not in self._tables:
+                continue
+            appender = self._appenders.get(name)
+            if appender is None:
+                del self._tables[name]
+            else:
+                self._tables[name] = appender(self, self._tables[name], batch)
+
+
+def convert_all(ruta_base, force=False):
+    for name in SCHEMAS:
+        if not os.path.exists(f"{ruta_base}/{name}.csv"):
+            print(f"{name}: sin CSV, se omite")
+            continue
+        if not force and _is_fresh(name, ruta_base):
+            print(f"{name}: al día")
+            continue
+        inicio = time.perf_counter()
+        destino = convert_table(name, ruta_base)
+        print(f"{name}: {os.path.getsize(destino) / 1e6:.1f} MB en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte los CSV de ./data al almacén columnar Arrow")
+    parser.add_argument("--data", default="./data", help="Directorio con los CSV")
+    parser.add_argument("--force", action="store_true", help="Reconstruir aunque los CSV no hayan cambiado")
+    args = parser.parse_args()
+    convert_all(args.data, force=args.force)
@@ -0,0 +1,115 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+
+# Exporta todas las figuras de todas las temporadas (y cada valor de los demás
+# selectores, como en warmup.py) a ficheros JSON estáticos con un índice, para
+# servirlas sin ejecutar los callbacks (F1_STATIC_DIR, ver wsgi.py y
+# static_bundles.py). Cada temporada se exporta en un proceso del pool.
+#
+#   python export.py --out ./data/.static --workers 8
+
+# Nombre de los directorios de cada exportación (versión de las figuras)
+VERSION_DIR = re.compile(r"[0-9a-f]{12}-[0-9a-f]{8}(-compact)?")
+
+
+def export_year(year, out, include_all_time):
+    import app
+    from data_store import MissingTableError
+    from static_bundles import bundle_key, bundle_path
+
+    version = app.registry.get("figure_cache").version
+    figures, timings = {}, []
+    for graph_id, callback, inputs in app.GRAPH_CALLBACKS:
+        all_time = app.ALL_TIME_GRAPHS.get(graph_id)
+        for values in itertools.product(*(app.INPUT_CHOICES[i](year) for i in inputs)):
+            # Los gráficos que no dependen del año sólo se exportan una vez
+            export_year_value = None if all_time is not None and all_time(*values) else year
+            if export_year_value is None and not include_all_time:
+                continue
+            key = bundle_key(export_year_value, values)
+            inicio = time.perf_counter()
+            try:
+                figure_json = app.serialize_figure(callback(year, *values))
+            except MissingTableError as error:
+                # Sin exportar: la petición seguirá yendo al callback, que
+                # muestra el aviso de datos ausentes
+                timings.append({"graph": graph_id, "year": int(year), "status": f"sin datos ({error.name})", "ms": 0.0})
+                continue
+            path = bundle_path(version, graph_id, key)
+            os.makedirs(os.path.join(out, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(out, path), "w", encoding="utf-8") as f:
+                f.write(figure_json)
+            figures.setdefault(graph_id, {})[key] = path
+            timings.append({"graph": graph_id, "year": int(year), "status": "ok", "bytes": len(figure_json),
+                            "ms": (time.perf_counter() - inicio) * 1000})
+    return version, figures, timings
+
+
+def write_index(out, version, figures, graph_inputs):
+    index = {
+        "version": version,
+        "graphs": {
+            graph_id: {"inputs": list(graph_inputs[graph_id]), "figures": graph_figures}
+            for graph_id, graph_figures in figures.items()
+        },
+    }
+    # Sustitución atómica: los workers que sirven la exportación anterior
+    # pasan a la nueva en su siguiente petición
+    temporal = os.path.join(out, f"index.{os.getpid()}.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(temporal, os.path.join(out, "index.json"))
+
+    # Se borran las exportaciones de versiones anteriores
+    for name in os.listdir(out):
+        if name != version and VERSION_DIR.fullmatch(name) and os.path.isdir(os.path.join(out, name)):
+            shutil.rmtree(os.path.join(out, name), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta las figuras de todas las temporadas a ficheros estáticos")
+    parser.add_argument("--out", default=os.environ.get("F1_STATIC_DIR", "./data/.static"),
+                        help="Directorio de la exportación (F1_STATIC_DIR)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos en paralelo")
+    parser.add_argument("--years", type=int, nargs="*", help="Temporadas a exportar (por defecto todas)")
+    parser.add_argument("--json", help="Guardar los tiempos por figura en este fichero JSON")
+    args = parser.parse_args()
+
+    # Sin caché de figuras en disco: cada figura se calcula con los datos actuales
+    os.environ.pop("F1_FIGURE_CACHE_DIR", None)
+    import app
+
+    years = args.years or [option["value"] for option in app.serve_layout()["year-selector"].options]
+    os.makedirs(args.out, exist_ok=True)
+
+    inicio = time.perf_counter()
+    tasks = [(year, args.out, i == 0) for i, year in enumerate(years)]
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            exported = list(pool.map(export_year, *zip(*tasks)))
+    else:
+        exported = [export_year(*task) for task in tasks]
+
+    versions = {version for version, _, _ in exported}
+    if len(versions) != 1:
+        raise SystemExit(f"Los datos cambiaron durante la exportación ({', '.join(sorted(versions))}); vuelve a lanzarla")
+    figures, timings = {}, []
+    for _, year_figures, year_timings in exported:
+        for graph_id, graph_figures in year_figures.items():
+            figures.setdefault(graph_id, {}).update(graph_figures)
+        timings += year_timings
+    write_index(args.out, versions.pop(), figures, {graph_id: inputs for graph_id, _, inputs in app.GRAPH_CALLBACKS})
+
+    total_bytes = sum(timing.get("bytes", 0) for timing in timings)
+    missing = sum(timing["status"] != "ok" for timing in timings)
+    print(f"{len(timings) - missing} figuras ({total_bytes / 2**20:.1f} MB) de {len(years)} temporadas "
+          f"en {time.perf_counter() - inicio:.1f}s -> {args.out}" + (f" ({missing} sin datos)" if missing else ""))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=2)
@@ -0,0 +1,160 @@
+from collections import Counter, OrderedDict
+import contextlib
+import hashlib
+import os
+import shutil
+import threading
+
+
+# Caché de figuras ya serializadas (JSON) por (gráfico, año, variante), donde
+# la variante son los valores de los demás selectores del gráfico (circuito,
+# vista...). Las figuras son funciones puras de esas entradas sobre datos estáticos, así que
+# una vista repetida sólo cuesta una búsqueda. La versión de los datos forma
+# parte de la clave: al cambiar los CSV las entradas antiguas dejan de usarse.
+#
+# En disco cada gráfico guarda como mucho disk_maxsize figuras: al pasarse se
+# borran las menos usadas (leerlas actualiza su mtime) hasta el 90 %. El
+# recuento se hace cada DISK_CHECK_EVERY escrituras de ese gráfico en el
+# proceso. Al crear la caché se borran los directorios de otras versiones.
+DISK_CHECK_EVERY = 32
+
+
+class FigureCache:
+    def __init__(self, version, maxsize=256, directory=None, disk_maxsize=10000):
+        self.version = version
+        self._maxsize = maxsize
+        self._directory = directory
+        self._disk_maxsize = disk_maxsize
+        self._disk_writes = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            self._prune_versions()
+
+    # Con count=False la búsqueda no cuenta como acierto ni fallo (la petición
+    # aún puede acabar en el callback, que la vuelve a buscar)
+    def get(self, graph_id, year, variant=None, count=True):
+        key = (graph_id, year, variant)
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is not None:
+                self._entries.move_to_end(key)
+                self.hits += count
+                return figure_json
+
+        figure_json = self._read_disk(key)
+        with self._lock:
+            if figure_json is None:
+                self.misses += count
+                return None
+            self.hits += count
+            self._store(key, figure_json)
+        return figure_json
+
+    def count_hits(self, hits):
+        with self._lock:
+            self.hits += hits
+
+    def put(self, graph_id, year, variant, figure_json):
+        key = (graph_id, year, variant)
+        with self._lock:
+            self._store(key, figure_json)
+        self._write_disk(key, figure_json)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Tras una ingesta incremental: la caché pasa a la nueva versión de los
+    # datos conservando las figuras de las temporadas no afectadas. Las de
+    # year None (gráficos de toda la historia) siempre se descartan.
+    def rebase(self, version, years):
+        stale = {str(year) for year in years} | {"None"}
+        with self._lock:
+            old_version, self.version = self.version, version
+            for key in [key for key in self._entries if str(key[1]) in stale]:
+                del self._entries[key]
+        if self._directory is None or old_version == version:
+            return self
+        old_dir = os.path.join(self._directory, old_version)
+        new_dir = os.path.join(self._directory, version)
+        if os.path.isdir(old_dir) and not os.path.exists(new_dir):
+            try:
+                os.rename(old_dir, new_dir)
+            except OSError:
+                pass  # Otro proceso ya la ha movido
+        if os.path.isdir(new_dir):
+            for graph_id in os.listdir(new_dir):
+                graph_dir = os.path.join(new_dir, graph_id)
+                for filename in os.listdir(graph_dir):
+                    if filename.split("_", 1)[0] in stale:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(os.path.join(graph_dir, filename))
+        return self
+
+    def _store(self, key, figure_json):
+        self._entries[key] = figure_json
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    # Backend en disco opcional, compartido entre los workers de gunicorn
+    def _path(self, key):
+        graph_id, year, variant = key
+        variant_hash = hashlib.sha1(str(variant).encode()).hexdigest()[:16]
+        return os.path.join(self._directory, self.version, graph_id, f"{year}_{variant_hash}.json")
+
+    def _read_disk(self, key):
+        if self._directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                figure_json = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return figure_json
+
+    def _write_disk(self, key, figure_json):
+        if self._directory is None:
+            return
+        destino = self._path(key)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(figure_json)
+        os.replace(temporal, destino)
+        graph_id = key[0]
+        with self._lock:
+            self._disk_writes[graph_id] += 1
+            check = self._disk_writes[graph_id] % DISK_CHECK_EVERY == 0
+        if check:
+            self._evict_disk(os.path.dirname(destino))
+
+    def _evict_disk(self, graph_dir):
+        def mtime(entry):
+            try:
+                return entry.stat().st_mtime_ns
+            except FileNotFoundError:
+                return 0
+        with os.scandir(graph_dir) as entries:
+            files = [entry for entry in entries if entry.name.endswith(".json")]
+        if len(files) <= self._disk_maxsize:
+            return
+        files.sort(key=mtime)
+        for entry in files[:len(files) - int(self._disk_maxsize * 0.9)]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry.path)
+
+    def _prune_versions(self):
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self._directory, name)
+            if name != self.version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
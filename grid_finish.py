@@ -0,0 +1,30 @@
+import numpy as np
+
+
+# Histograma 2-D (posición de salida x posición final) por temporada, contado
+# una sola vez con np.bincount. Cualquier conjunto de temporadas se resume
+# sumando sus capas, así que la figura ocupa como mucho una celda por par
+# (salida, llegada) sea cual sea el número de temporadas.
+class GridFinishHistogram:
+    def __init__(self, results):
+        years = results["year"].to_numpy()
+        grid = results["grid"].to_numpy().astype(np.int64)
+        finish = results["positionOrder"].to_numpy().astype(np.int64)
+
+        self.years = np.unique(years)
+        self.max_grid = int(grid.max()) if len(grid) else 0
+        self.max_finish = int(finish.max()) if len(finish) else 0
+        shape = (len(self.years), self.max_grid + 1, self.max_finish + 1)
+
+        year_index = np.searchsorted(self.years, years)
+        flat = np.ravel_multi_index((year_index, grid, finish), shape)
+        self.counts = np.bincount(flat, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+
+    # Recuentos (salida x llegada, sin la fila/columna 0) de las temporadas
+    # pedidas; years=None suma toda la historia
+    def counts_for(self, years=None):
+        if years is None:
+            layers = self.counts
+        else:
+            layers = self.counts[np.isin(self.years, years)]
+        return layers.sum(axis=0)[1:, 1:]
@@ -0,0 +1,17 @@
+import gc
+import os
+
+# Configuración de gunicorn (se lee automáticamente desde el directorio de
+# trabajo). Con F1_PRELOAD=1 la aplicación y sus tablas se cargan una sola vez
+# en el proceso maestro y los workers las comparten por copy-on-write:
+#
+#   F1_PRELOAD=1 gunicorn wsgi:server --workers 8
+preload_app = os.environ.get("F1_PRELOAD", "0") == "1"
+
+
+# preload() ya congela los objetos precargados con gc.freeze(); antes de cada
+# fork se congela también lo creado después en el maestro, para que el
+# recolector de los workers no lo recorra ni escriba en sus páginas
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
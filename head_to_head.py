@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Estadísticas de cada pareja de pilotos por temporada, calculadas una sola vez
+# con un self-join de results (y de qualifying) por raceId. La tabla es
+# dispersa: sólo hay filas para los pilotos que coincidieron en alguna
+# carrera, con driver_a < driver_b. Cada pareja es un tramo contiguo de filas y
+# un duelo en cualquier rango de temporadas suma ese tramo; los duelos pedidos
+# se guardan además con desalojo LRU.
+STATS = ["races", "a_ahead", "b_ahead", "a_points", "b_points", "qualifying", "a_quali_ahead", "b_quali_ahead"]
+
+
+@dataclass(frozen=True)
+class HeadToHead:
+    driver_a: int
+    driver_b: int
+    races: int            # Carreras con resultado de los dos
+    a_ahead: int          # Carreras en las que A acabó por delante
+    b_ahead: int
+    a_points: float       # Puntos de cada uno en esas carreras
+    b_points: float
+    qualifying: int       # Clasificaciones con posición de los dos
+    a_quali_ahead: int
+    b_quali_ahead: int
+
+
+# Una fila por pareja (a < b) y carrera con el valor de cada uno
+def race_pairs(rows):
+    pairs = rows.merge(rows, on="raceId", suffixes=("_a", "_b"))
+    return pairs[pairs["driverId_a"] < pairs["driverId_b"]]
+
+
+def pairwise_stats(results, races, qualifying=None):
+    years = races[["raceId", "year"]]
+    finishes = race_pairs(results[["raceId", "driverId", "positionOrder", "points"]])
+    stats = pd.DataFrame({
+        "raceId": finishes["raceId"].to_numpy(),
+        "driver_a": finishes["driverId_a"].to_numpy(),
+        "driver_b": finishes["driverId_b"].to_numpy(),
+        "races": 1,
+        "a_ahead": (finishes["positionOrder_a"] < finishes["positionOrder_b"]).to_numpy(),
+        "b_ahead": (finishes["positionOrder_b"] < finishes["positionOrder_a"]).to_numpy(),
+        "a_points": finishes["points_a"].to_numpy(dtype=np.float64),
+        "b_points": finishes["points_b"].to_numpy(dtype=np.float64),
+    })
+    parts = [stats]
+    if qualifying is not None:
+        sessions = race_pairs(qualifying[["raceId", "driverId", "position"]])
+        parts.append(pd.DataFrame({
+            "raceId": sessions["raceId"].to_numpy(),
+            "driver_a": sessions["driverId_a"].to_numpy(),
+            "driver_b": sessions["driverId_b"].to_numpy(),
+            "qualifying": 1,
+            "a_quali_ahead": (sessions["position_a"] < sessions["position_b"]).to_numpy(),
+            "b_quali_ahead": (sessions["position_b"] < sessions["position_a"]).to_numpy(),
+        }))
+    rows = pd.concat(parts).merge(years, on="raceId")
+    grouped = rows.groupby(["driver_a", "driver_b", "year"])[[c for c in STATS if c in rows]].sum()
+    return grouped.reindex(columns=STATS, fill_value=0).reset_index()
+
+
+class HeadToHeadIndex:
+    def __init__(self, results, races, qualifying=None, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._set_table(pairwise_stats(results, races, qualifying))
+
+    def _set_table(self, table):
+        self._table = table.sort_values(["driver_a", "driver_b", "year"], kind="stable").reset_index(drop=True)
+        keys = self._table[["driver_a", "driver_b"]].to_numpy()
+        new_pair = np.ones(len(keys), dtype=bool)
+        new_pair[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+        starts = np.flatnonzero(new_pair)
+        stops = np.append(starts[1:], len(keys))
+        self._offsets = {(int(a), int(b)): (int(start), int(stop))
+                         for (a, b), start, stop in zip(keys[starts], starts, stops)}
+        self._stats = self._table[STATS].to_numpy(dtype=np.float64)
+        self._years = self._table["year"].to_numpy()
+
+    # Ingesta incremental: se suman las parejas de las carreras nuevas y se
+    # descartan los duelos guardados
+    def add(self, results, races, qualifying=None):
+        new_stats = pairwise_stats(results, races, qualifying)
+        table = pd.concat([self._table, new_stats]).groupby(["driver_a", "driver_b", "year"])[STATS].sum().reset_index()
+        with self._lock:
+            self._set_table(table)
+            self._entries.clear()
+        return self
+
+    # Duelo entre dos pilotos en las temporadas first..last (toda la historia
+    # si no se indican)
+    def compare(self, driver_a, driver_b, first=None, last=None):
+        key = (driver_a, driver_b, first, last)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._build(driver_a, driver_b, first, last)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _build(self, driver_a, driver_b, first, last):
+        swapped = driver_a > driver_b
+        start, stop = self._offsets.get((min(driver_a, driver_b), max(driver_a, driver_b)), (0, 0))
+        years = self._years[start:stop]
+        selected = np.ones(len(years), dtype=bool)
+        if first is not None:
+            selected &= years >= first
+        if last is not None:
+            selected &= years <= last
+        totals = dict(zip(STATS, self._stats[start:stop][selected].sum(axis=0)))
+        if swapped:
+            totals = {name: totals[mirror(name)] for name in STATS}
+        return HeadToHead(
+            driver_a=driver_a, driver_b=driver_b,
+            **{name: float(value) if name.endswith("points") else int(value) for name, value in totals.items()},
+        )
+
+
+# Estadística equivalente con los pilotos intercambiados (a_ahead <-> b_ahead)
+def mirror(name):
+    if name.startswith("a_"):
+        return "b_" + name[2:]
+    if name.startswith("b_"):
+        return "a_" + name[2:]
+    return name
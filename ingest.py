@@ -0,0 +1,38 @@
+import argparse
+import os
+import time
+
+from data_store import data_version, ingest_tables, read_ingest_directory
+from figure_cache import FigureCache
+
+# Ingesta incremental de un nuevo fin de semana de carreras. El directorio de
+# entrada contiene CSV con la misma cabecera que ./data pero sólo con las filas
+# nuevas (results.csv, driver_standings.csv, pit_stops.csv, ...). Las filas se
+# añaden a ./data y al almacén Arrow, y los workers en marcha las aplican en
+# su siguiente petición, invalidando sólo las figuras de la temporada afectada.
+#
+#   python ingest.py nuevos/ --cache-dir ./data/.figures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Añade las filas de nuevas carreras a ./data sin reiniciar los workers")
+    parser.add_argument("directory", help="Directorio con los CSV de filas nuevas")
+    parser.add_argument("--data", default="./data", help="Directorio de datos de la aplicación")
+    parser.add_argument("--cache-dir", default=os.environ.get("F1_FIGURE_CACHE_DIR"),
+                        help="Caché de figuras en disco a actualizar (F1_FIGURE_CACHE_DIR)")
+    args = parser.parse_args()
+
+    new_tables, csv_lines = read_ingest_directory(args.directory)
+    if not new_tables:
+        parser.error(f"No hay CSV reconocibles en {args.directory}")
+
+    from app import figure_version
+    old_version = figure_version(data_version(args.data))
+
+    inicio = time.perf_counter()
+    meta = ingest_tables(args.data, new_tables, csv_lines)
+    if args.cache_dir:
+        FigureCache(old_version, directory=args.cache_dir).rebase(figure_version(meta["data_version"]), meta["years"])
+
+    filas = ", ".join(f"{name}={rows}" for name, rows in meta["rows"].items())
+    print(f"Ingesta {meta['generation']}: {filas}; temporadas {meta['years']} en {time.perf_counter() - inicio:.2f}s")
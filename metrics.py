@@ -0,0 +1,107 @@
+import contextlib
+import cProfile
+import os
+import threading
+import time
+
+
+# Métricas por callback: tiempo de cada fase (filtrado, agregación, figura y
+# serialización), aciertos/fallos de la caché de figuras y tamaño de la
+# respuesta. Cada fase cuenta sólo su tiempo propio: si se anida una fase
+# dentro de otra, su duración se descuenta de la exterior.
+PHASES = ("filter", "aggregation", "figure", "serialization")
+
+
+class CallbackMetrics:
+    def __init__(self, profile_dir=None):
+        self._profile_dir = profile_dir
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def request(self, graph_id):
+        record = {"phases": dict.fromkeys(PHASES, 0.0), "stack": [], "hit": None, "bytes": 0}
+        self._local.record = record
+        profiler = cProfile.Profile() if self._profile_dir else None
+        inicio = time.perf_counter()
+        try:
+            if profiler is not None:
+                try:
+                    profiler.enable()
+                except ValueError:  # Ya hay otro perfilador activo en el proceso
+                    profiler = None
+            yield record
+        finally:
+            total = time.perf_counter() - inicio
+            if profiler is not None:
+                profiler.disable()
+                self._dump_profile(profiler, graph_id)
+            self._local.record = None
+            self._add(graph_id, record, total)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        record = getattr(self._local, "record", None)
+        if record is None:
+            yield
+            return
+        # [inicio, tiempo de las fases hijas]
+        frame = [time.perf_counter(), 0.0]
+        record["stack"].append(frame)
+        try:
+            yield
+        finally:
+            record["stack"].pop()
+            elapsed = time.perf_counter() - frame[0]
+            record["phases"][name] += elapsed - frame[1]
+            if record["stack"]:
+                record["stack"][-1][1] += elapsed
+
+    def cache_result(self, hit):
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            record["hit"] = hit
+
+    def payload(self, size):
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            record["bytes"] = size
+
+    def snapshot(self):
+        with self._lock:
+            stats = {graph_id: dict(entry, phases_ms=dict(entry["phases_ms"])) for graph_id, entry in self._stats.items()}
+        for entry in stats.values():
+            calls = entry["calls"]
+            entry["mean_ms"] = entry["total_ms"] / calls
+            entry["mean_phases_ms"] = {name: ms / calls for name, ms in entry["phases_ms"].items()}
+            entry["mean_bytes"] = entry["bytes"] / calls
+        return {"pid": os.getpid(), "callbacks": stats}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _add(self, graph_id, record, total):
+        with self._lock:
+            entry = self._stats.setdefault(graph_id, {
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "phases_ms": dict.fromkeys(PHASES, 0.0),
+                "cache_hits": 0, "cache_misses": 0, "bytes": 0, "max_bytes": 0,
+            })
+            entry["calls"] += 1
+            entry["total_ms"] += total * 1000
+            entry["max_ms"] = max(entry["max_ms"], total * 1000)
+            for name, seconds in record["phases"].items():
+                entry["phases_ms"][name] += seconds * 1000
+            if record["hit"] is True:
+                entry["cache_hits"] += 1
+            elif record["hit"] is False:
+                entry["cache_misses"] += 1
+            entry["bytes"] += record["bytes"]
+            entry["max_bytes"] = max(entry["max_bytes"], record["bytes"])
+
+    def _dump_profile(self, profiler, graph_id):
+        os.makedirs(self._profile_dir, exist_ok=True)
+        nombre = f"{graph_id}-{time.time_ns()}-{os.getpid()}.prof"
+        profiler.dump_stats(os.path.join(self._profile_dir, nombre))
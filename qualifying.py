@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from season_cache import year_offsets
+
+
+# Tiempos de clasificación como arrays compactos, construidos una sola vez a
+# partir de las columnas q1_ms/q2_ms/q3_ms que el almacén ya convierte de
+# "m:ss.mmm" a milisegundos. Las filas están ordenadas por (año, ronda), así
+# que una temporada es un slice sin copia y cada ronda un tramo contiguo: las
+# diferencias con la pole y con el compañero son restas entre filas y los
+# mejores tiempos de cada sesión un reduceat de NumPy. Dos pilotos se comparan
+# en la última sesión en la que marcaron tiempo los dos (un eliminado en Q1,
+# con el tiempo de Q1 del otro), y la referencia de la pole es quien salió
+# primero (position == 1), no el mejor tiempo de cualquier sesión.
+SESSIONS = ("q1", "q2", "q3")
+# Valor de relleno de los tiempos ausentes (no cuenta al tomar mínimos)
+NO_TIME = np.iinfo(np.int32).max
+
+
+@dataclass(frozen=True)
+class QualifyingSeason:
+    year: int
+    rounds: np.ndarray          # Ronda de cada fila
+    driver_ids: np.ndarray
+    constructor_ids: np.ndarray
+    positions: np.ndarray       # Posición final de la clasificación
+    times: np.ndarray           # (filas, sesiones) en ms, NO_TIME si no hay tiempo
+    round_starts: np.ndarray    # Primera fila de cada ronda
+
+    # Número de filas de cada ronda
+    def round_lengths(self):
+        return np.diff(np.append(self.round_starts, len(self.rounds)))
+
+    # Fila del poleman de cada ronda (-1 si ninguna fila tiene position == 1)
+    def pole_rows(self):
+        poles = np.full(len(self.round_starts), -1)
+        round_index = np.repeat(np.arange(len(self.round_starts)), self.round_lengths())
+        rows = np.flatnonzero(self.positions == 1)
+        poles[round_index[rows]] = rows
+        return poles
+
+    # Diferencia (ms) de cada fila con su fila de referencia en la última
+    # sesión en la que marcaron tiempo las dos; NaN si no hay referencia (-1)
+    # o no coinciden en ninguna sesión
+    def session_gap(self, references):
+        gap = np.full(len(references), np.nan)
+        rows = np.flatnonzero(references >= 0)
+        own, other = self.times[rows], self.times[references[rows]]
+        shared = (own != NO_TIME) & (other != NO_TIME)
+        compared = shared.any(axis=1)
+        last = shared.shape[1] - 1 - np.argmax(shared[:, ::-1], axis=1)
+        rows, own, other, last = rows[compared], own[compared], other[compared], last[compared]
+        picked = np.arange(len(rows))
+        gap[rows] = own[picked, last].astype(np.float64) - other[picked, last]
+        return gap
+
+    # Diferencia (ms) de cada piloto con el poleman de su ronda
+    def gap_to_pole(self):
+        return self.session_gap(np.repeat(self.pole_rows(), self.round_lengths()))
+
+    # Diferencia (ms) de cada piloto con su compañero en la misma carrera: el
+    # mejor clasificado del equipo se compara con el segundo y el resto con
+    # el primero; NaN si no tiene compañero con tiempo en una misma sesión
+    def teammate_gap(self):
+        # Cada equipo de cada ronda queda contiguo y ordenado por posición
+        rows = np.lexsort((self.positions, self.constructor_ids, self.rounds))
+        team = np.stack([self.rounds[rows], self.constructor_ids[rows]])
+        new_team = np.ones(len(rows), dtype=bool)
+        new_team[1:] = (team[:, 1:] != team[:, :-1]).any(axis=0)
+        starts = np.flatnonzero(new_team)
+        sizes = np.diff(np.append(starts, len(rows)))
+        first = np.repeat(starts, sizes)
+        reference = np.where(new_team, first + 1, first)
+        paired = np.repeat(sizes > 1, sizes)
+        references = np.full(len(rows), -1)
+        references[rows[paired]] = rows[reference[paired]]
+        return self.session_gap(references)
+
+    # Mejor tiempo de cada sesión en cada ronda, (rondas, sesiones) en ms
+    def session_bests(self):
+        if not len(self.times):
+            return np.empty((0, len(SESSIONS)))
+        bests = np.minimum.reduceat(self.times, self.round_starts, axis=0).astype(np.float64)
+        bests[bests == NO_TIME] = np.nan
+        return bests
+
+
+class QualifyingIndex:
+    def __init__(self, qualifying, races):
+        rows = qualifying[["raceId", "driverId", "constructorId", "position", *(f"{s}_ms" for s in SESSIONS)]].merge(
+            races[["raceId", "year", "round"]], on="raceId"
+        ).sort_values(["year", "round"], kind="stable")
+
+        self.rounds = rows["round"].to_numpy(dtype=np.int16)
+        self.driver_ids = rows["driverId"].to_numpy(dtype=np.int32)
+        self.constructor_ids = rows["constructorId"].to_numpy(dtype=np.int32)
+        self.positions = rows["position"].to_numpy(dtype=np.int16)
+        self.times = np.column_stack([
+            rows[f"{s}_ms"].to_numpy(dtype=np.int32, na_value=NO_TIME) for s in SESSIONS
+        ])
+        self._offsets = year_offsets(rows)
+
+    def years(self):
+        return sorted(self._offsets)
+
+    def season(self, year):
+        start, stop = self._offsets.get(year, (0, 0))
+        rounds = self.rounds[start:stop]
+        round_starts = np.flatnonzero(np.diff(rounds, prepend=-1))
+        return QualifyingSeason(
+            year=year,
+            rounds=rounds,
+            driver_ids=self.driver_ids[start:stop],
+            constructor_ids=self.constructor_ids[start:stop],
+            positions=self.positions[start:stop],
+            times=self.times[start:stop],
+            round_starts=round_starts,
+        )
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Agregados de una temporada que comparten los callbacks de app.py
+@dataclass(frozen=True)
+class SeasonAggregates:
+    year: int
+    results: pd.DataFrame          # Filas de la temporada (slice de results_cleaned)
+    points_by_driver: pd.DataFrame  # driverId, points (orden descendente)
+    avg_positions: pd.DataFrame     # driverId, positionOrder (orden ascendente)
+
+
+# Índice año -> (primera fila, fila siguiente a la última) de una tabla
+# ordenada por año
+def year_offsets(results):
+    years, starts = np.unique(results["year"].to_numpy(), return_index=True)
+    stops = np.append(starts[1:], len(results))
+    return {int(year): (int(start), int(stop)) for year, start, stop in zip(years, starts, stops)}
+
+
+class SeasonCache:
+    # results está ordenado por (year, raceId): cada temporada es un tramo
+    # contiguo de filas y el índice año -> (inicio, fin) se calcula una sola
+    # vez al arrancar. Una temporada o un rango de temporadas es un slice sin
+    # copia en lugar de una máscara sobre toda la tabla. Los agregados de cada
+    # temporada se construyen en el primer acceso y se guardan con desalojo
+    # LRU para acotar la memoria.
+    def __init__(self, results, maxsize=16):
+        self._results = results
+        self.maxsize = maxsize
+        self._offsets = year_offsets(results)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def years(self):
+        return sorted(self._offsets)
+
+    # Filas de las temporadas first..last (ambas incluidas) como un único slice
+    def range(self, first, last):
+        years = [year for year in self._offsets if first <= year <= last]
+        if not years:
+            return self._results.iloc[0:0]
+        return self._results.iloc[self._offsets[min(years)][0]:self._offsets[max(years)][1]]
+
+    def get(self, year):
+        with self._lock:
+            entry = self._entries.get(year)
+            if entry is not None:
+                self._entries.move_to_end(year)
+                return entry
+
+        entry = self._build(year)
+
+        with self._lock:
+            self._entries[year] = entry
+            self._entries.move_to_end(year)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Ingesta incremental: results ya incluye las filas nuevas (y sigue
+    # ordenado); se recalcula el índice y se descartan los agregados de las
+    # temporadas que reciben filas
+    def extend(self, results, years):
+        with self._lock:
+            self._results = results
+            self._offsets = year_offsets(results)
+            for year in years:
+                self._entries.pop(year, None)
+        return self
+
+    def _build(self, year):
+        start, stop = self._offsets.get(year, (0, 0))
+        season = self._results.iloc[start:stop]
+
+        points_by_driver = (
+            season.groupby("driverId")["points"].sum().reset_index()
+            .sort_values(by="points", ascending=False)
+        )
+        avg_positions = (
+            season.groupby("driverId")["positionOrder"].mean().reset_index()
+            .sort_values(by="positionOrder")
+        )
+
+        return SeasonAggregates(
+            year=year,
+            results=season,
+            points_by_driver=points_by_driver,
+            avg_positions=avg_positions,
+        )
+
+
+# Puntos acumulados de una temporada como matriz densa rondas x pilotos,
+# tomada de driver_standings (que ya incluye las carreras sprint). Antes de la
+# primera ronda con clasificación de un piloto la celda es NaN.
+@dataclass(frozen=True)
+class PointsEvolution:
+    year: int
+    rounds: np.ndarray      # número de ronda de cada fila
+    race_ids: np.ndarray    # raceId de cada fila
+    driver_ids: np.ndarray  # driverId de cada columna (orden: puntos finales descendentes)
+    points: np.ndarray      # float32, rondas x pilotos
+
+
+def points_evolution_by_year(standings, races):
+    standings = standings[["raceId", "driverId", "points"]].merge(races[["raceId", "year", "round"]], on="raceId")
+    by_year = {}
+    for year, group in standings.groupby("year"):
+        matrix = group.pivot(index=["round", "raceId"], columns="driverId", values="points").ffill()
+        matrix = matrix[matrix.iloc[-1].sort_values(ascending=False).index]
+        by_year[int(year)] = PointsEvolution(
+            year=int(year),
+            rounds=matrix.index.get_level_values("round").to_numpy(),
+            race_ids=matrix.index.get_level_values("raceId").to_numpy(),
+            driver_ids=matrix.columns.to_numpy(),
+            points=matrix.to_numpy(dtype=np.float32),
+        )
+    return by_year
+
+
+# Filas de unos standings (con year y round) que son la clasificación tras la
+# última carrera del calendario de su temporada. Una temporada en curso, o sin
+# standings de su última carrera, no tiene ninguna: ni campeón ni posición final
+def final_round_rows(standings, races):
+    last_rounds = races.groupby("year")["round"].max()
+    return standings["round"].to_numpy() == last_rounds.reindex(standings["year"]).to_numpy()
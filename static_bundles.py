@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+
+from flask import Response, request
+
+
+# Figuras exportadas como ficheros JSON estáticos (export.py) y servidas
+# directamente desde app.server (F1_STATIC_DIR, ver wsgi.py): una petición de
+# un gráfico cuyas entradas están en el índice se responde con el fichero tal
+# cual, sin pandas ni callbacks. Las entradas que no se exportaron, o todas si
+# los datos han cambiado desde la exportación, siguen con los callbacks en vivo.
+#
+#   <directorio>/index.json                    versión y ficheros de cada gráfico
+#   <directorio>/<versión>/<gráfico>/<hash>.json
+
+INDEX_NAME = "index.json"
+
+
+# Clave de una figura: año (None si no depende del año) y valores de los
+# demás selectores, en JSON
+def bundle_key(year, values):
+    return json.dumps([year, *values], separators=(",", ":"))
+
+
+def bundle_path(version, graph_id, key):
+    return os.path.join(version, graph_id, hashlib.sha1(key.encode()).hexdigest()[:16] + ".json")
+
+
+class StaticBundles:
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = None
+        self.graphs = {}
+        self._index_mtime = None
+        self.reload()
+
+    # Relee el índice si una exportación nueva lo ha sustituido
+    def reload(self):
+        index_path = os.path.join(self.directory, INDEX_NAME)
+        try:
+            mtime = os.stat(index_path).st_mtime_ns
+        except FileNotFoundError:
+            self.version, self.graphs, self._index_mtime = None, {}, None
+            return self
+        if mtime != self._index_mtime:
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            self.version, self.graphs, self._index_mtime = index["version"], index["graphs"], mtime
+        return self
+
+    # Fichero de la figura de un gráfico para los valores de una petición; se
+    # prueba la clave del año y la de los gráficos que no dependen de él
+    def lookup(self, graph_id, values):
+        graph = self.graphs.get(graph_id)
+        if graph is None:
+            return None
+        selected = [values.get(input_id) for input_id in graph["inputs"]]
+        figures = graph["figures"]
+        path = figures.get(bundle_key(values.get("year-selector"), selected)) or figures.get(bundle_key(None, selected))
+        return os.path.join(self.directory, path) if path else None
+
+    # Contenido del fichero exportado de un gráfico, o None si no está
+    def figure_json(self, graph_id, values):
+        path = self.lookup(graph_id, values)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # Respuesta de Dash con las figuras exportadas, o None si falta alguna
+    def response(self, payload):
+        return figures_response(payload, self.figure_json)
+
+
+# Valores de las entradas y estados de una petición de Dash, por id
+def request_values(payload):
+    items = [*payload.get("inputs", []), *payload.get("state", [])]
+    return {item["id"]: item.get("value") for item in items if isinstance(item, dict)}
+
+
+# Respuesta de Dash (/_dash-update-component) compuesta con figuras ya
+# serializadas, figure_json(graph_id, valores) -> JSON o None, que se copian
+# tal cual (sin json.loads ni volver a serializarlas); None si falta alguna de
+# las salidas pedidas. También la usa app.py con la caché de figuras
+def figures_response(payload, figure_json):
+    outputs = payload.get("outputs")
+    outputs = outputs if isinstance(outputs, list) else [outputs]
+    values = request_values(payload)
+    parts = []
+    for output in outputs:
+        if not isinstance(output, dict) or output.get("property") != "figure":
+            return None
+        figure = figure_json(output["id"], values)
+        if figure is None:
+            return None
+        parts.append(f"{json.dumps(output['id'])}:{{\"figure\":{figure}}}")
+    return '{"multi":true,"response":{' + ",".join(parts) + "}}"
+
+
+# Petición de un callback (no el sondeo del resultado de un background callback)
+def dash_update_request():
+    return (request.method == "POST" and request.path.endswith("/_dash-update-component")
+            and not request.args.get("cacheKey"))
+
+
+# Atiende desde los ficheros exportados las peticiones de gráficos que están en
+# el índice, mientras la versión de los datos sea la de la exportación
+def serve_static_bundles(server, bundles, current_version):
+    @server.before_request
+    def static_bundle():
+        if not dash_update_request():
+            return None
+        if bundles.reload().version != current_version():
+            return None
+        body = bundles.response(request.get_json(silent=True) or {})
+        if body is None:
+            return None
+        return Response(body, mimetype="application/json")
+    return static_bundle
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Estrategia de paradas de cada carrera calculada una sola vez para todas las
+# carreras con operaciones por grupos: stints (tramos entre paradas), tiempos
+# de cada parada y, si existe lap_times, los intentos de undercut (un piloto
+# para antes que el coche que tiene delante y éste para en las vueltas
+# siguientes). Cada tabla queda ordenada por carrera y una carrera es un slice.
+
+# Vueltas que puede tardar el rival en responder a una parada
+UNDERCUT_WINDOW = 5
+
+
+@dataclass(frozen=True)
+class RaceStrategy:
+    race_id: int
+    stints: pd.DataFrame     # driverId, stint, start_lap, end_lap, laps
+    stops: pd.DataFrame      # driverId, stop, lap, milliseconds
+    undercuts: pd.DataFrame  # attacker, defender, lap, defender_lap, posiciones antes y después, success
+
+
+# Stints de cada piloto: de la salida a la primera parada, entre paradas y de
+# la última parada a su última vuelta (results.laps)
+def race_stints(stops, results):
+    finishes = results.loc[results["raceId"].isin(stops["raceId"].unique()), ["raceId", "driverId", "laps"]]
+    ends = pd.concat([stops[["raceId", "driverId", "lap"]], finishes.rename(columns={"laps": "lap"})])
+    ends = ends[ends["lap"] > 0].drop_duplicates().sort_values(["raceId", "driverId", "lap"], kind="stable")
+    drivers = ends.groupby(["raceId", "driverId"], sort=False)
+    stints = pd.DataFrame({
+        "raceId": ends["raceId"].to_numpy(),
+        "driverId": ends["driverId"].to_numpy(),
+        "stint": drivers.cumcount().to_numpy() + 1,
+        "start_lap": drivers["lap"].shift(fill_value=0).to_numpy(),
+        "end_lap": ends["lap"].to_numpy(),
+    })
+    stints["laps"] = stints["end_lap"] - stints["start_lap"]
+    return stints.astype({"stint": "int8", "start_lap": "int16", "end_lap": "int16", "laps": "int16"})
+
+
+# Intentos de undercut: el atacante para en la vuelta L siendo el coche
+# inmediatamente detrás del defensor en L-1, y el defensor para en
+# (L, L + UNDERCUT_WINDOW]. Se comparan sus posiciones en la vuelta siguiente
+# a la parada del defensor; si el defensor sigue delante es un overcut
+def undercut_attempts(stops, lap_times):
+    positions = lap_times[["raceId", "driverId", "lap", "position"]]
+    attempts = stops[["raceId", "driverId", "lap"]].rename(columns={"driverId": "attacker"})
+    attempts = attempts.assign(before_lap=attempts["lap"] - 1).merge(
+        positions.rename(columns={"driverId": "attacker", "lap": "before_lap", "position": "attacker_before"}),
+        on=["raceId", "attacker", "before_lap"],
+    )
+    attempts = attempts[attempts["attacker_before"] > 1]
+    attempts = attempts.assign(position=attempts["attacker_before"] - 1).merge(
+        positions.rename(columns={"driverId": "defender", "lap": "before_lap"}),
+        on=["raceId", "before_lap", "position"],
+    )
+
+    # Primera parada del defensor dentro de la ventana
+    defender_stops = stops[["raceId", "driverId", "lap"]].rename(columns={"driverId": "defender", "lap": "defender_lap"})
+    attempts = attempts.merge(defender_stops, on=["raceId", "defender"])
+    attempts = attempts[(attempts["defender_lap"] > attempts["lap"])
+                        & (attempts["defender_lap"] <= attempts["lap"] + UNDERCUT_WINDOW)]
+    attempts = attempts.sort_values("defender_lap").drop_duplicates(["raceId", "attacker", "lap"])
+
+    attempts = attempts.assign(after_lap=attempts["defender_lap"] + 1)
+    for role in ("attacker", "defender"):
+        attempts = attempts.merge(
+            positions.rename(columns={"driverId": role, "lap": "after_lap", "position": f"{role}_after"}),
+            on=["raceId", role, "after_lap"],
+        )
+    undercuts = attempts[["raceId", "attacker", "defender", "lap", "defender_lap", "attacker_before",
+                          "attacker_after", "defender_after"]].sort_values(["raceId", "lap"], kind="stable")
+    return undercuts.assign(success=undercuts["attacker_after"] < undercuts["defender_after"]).reset_index(drop=True)
+
+
+# Índice raceId -> (primera fila, fila siguiente a la última) de una tabla
+# ordenada por carrera
+def race_offsets(table):
+    race_ids, starts = np.unique(table["raceId"].to_numpy(), return_index=True)
+    stops = np.append(starts[1:], len(table))
+    return {int(race_id): (int(start), int(stop)) for race_id, start, stop in zip(race_ids, starts, stops)}
+
+
+class PitStrategyIndex:
+    def __init__(self, pit_stops, results, lap_times=None):
+        self.has_positions = lap_times is not None
+        self._tables = {"stints": None, "stops": None, "undercuts": None}
+        self.add(pit_stops, results, lap_times)
+
+    # Añade carreras nuevas: sólo se calculan las filas de esas carreras
+    def add(self, pit_stops, results, lap_times=None):
+        stops = pit_stops[["raceId", "driverId", "stop", "lap", "milliseconds"]].sort_values(
+            ["raceId", "driverId", "lap"], kind="stable"
+        )
+        new_tables = {"stints": race_stints(stops, results), "stops": stops}
+        if self.has_positions:
+            new_tables["undercuts"] = undercut_attempts(stops, lap_times[lap_times["raceId"].isin(stops["raceId"].unique())])
+        for name, rows in new_tables.items():
+            table = rows if self._tables[name] is None else pd.concat([self._tables[name], rows])
+            self._tables[name] = table.sort_values("raceId", kind="stable").reset_index(drop=True)
+        self._offsets = {name: race_offsets(table) for name, table in self._tables.items() if table is not None}
+        return self
+
+    def race_ids(self):
+        return sorted(self._offsets["stops"])
+
+    def race(self, race_id):
+        def rows(name):
+            table = self._tables[name]
+            if table is None:
+                return None
+            start, stop = self._offsets[name].get(race_id, (0, 0))
+            return table.iloc[start:stop].drop(columns="raceId")
+        return RaceStrategy(race_id=race_id, stints=rows("stints"), stops=rows("stops"), undercuts=rows("undercuts"))
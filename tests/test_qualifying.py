@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_store import read_csv_typed
+from qualifying import QualifyingIndex
+
+RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+# Una ronda de clasificación a partir de filas (piloto, equipo, posición, q1, q2, q3)
+def qualifying_round(rows):
+    qualifying = pd.DataFrame(rows, columns=["driverId", "constructorId", "position", "q1_ms", "q2_ms", "q3_ms"])
+    qualifying = qualifying.astype({f"q{i}_ms": "Int32" for i in (1, 2, 3)}).assign(raceId=1)
+    races = pd.DataFrame({"raceId": [1], "year": [2000], "round": [1]})
+    return QualifyingIndex(qualifying, races).season(2000)
+
+
+def gaps_by_driver(season, gaps):
+    return dict(zip(season.driver_ids.tolist(), gaps.tolist()))
+
+
+def test_pole_is_the_first_position_not_the_fastest_time():
+    # Q3 con gasolina de carrera: el poleman es más lento que su Q1 y que el
+    # Q1 de otros pilotos
+    season = qualifying_round([
+        (1, 10, 1, 80000, 79500, 81000),
+        (2, 10, 2, 79000, 79400, 81200),
+        (3, 20, 3, 80500, None, None),
+    ])
+    gaps = gaps_by_driver(season, season.gap_to_pole())
+    assert gaps[1] == 0
+    assert gaps[2] == 200
+    # Eliminado en Q1: se compara con el Q1 del poleman
+    assert gaps[3] == 500
+
+
+def test_gap_to_pole_without_pole_time_is_nan():
+    season = qualifying_round([
+        (1, 10, 1, None, None, None),
+        (2, 20, 2, 80000, None, None),
+    ])
+    assert np.isnan(season.gap_to_pole()).all()
+
+
+@pytest.mark.parametrize("rows, expected", [
+    # Los dos en Q3: se comparan sus tiempos de Q3
+    ([(1, 10, 1, 80000, 79000, 78000), (2, 10, 4, 79500, 79200, 78300)], {1: -300, 2: 300}),
+    # Uno eliminado en Q1: los dos se comparan con su tiempo de Q1
+    ([(1, 10, 2, 80000, 79000, 78000), (2, 10, 17, 79900, None, None)], {1: 100, 2: -100}),
+    # Sin sesión en común
+    ([(1, 10, 1, None, None, None), (2, 10, 5, 80000, None, None)], {1: None, 2: None}),
+    # Tres pilotos: el mejor clasificado con el segundo y el resto con el primero
+    ([(1, 10, 1, 80000, None, None), (2, 10, 2, 80100, None, None), (3, 10, 3, 80400, None, None)],
+     {1: -100, 2: 100, 3: 400}),
+    # Sin compañero
+    ([(1, 10, 1, 80000, None, None), (2, 20, 2, 80100, None, None)], {1: None, 2: None}),
+])
+def test_teammate_gap_uses_last_shared_session(rows, expected):
+    season = qualifying_round(rows)
+    gaps = gaps_by_driver(season, season.teammate_gap())
+    for driver_id, gap in expected.items():
+        if gap is None:
+            assert np.isnan(gaps[driver_id])
+        else:
+            assert gaps[driver_id] == gap
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(RUTA_DATOS, "qualifying.csv")), reason="sin datos")
+@pytest.mark.parametrize("year, round_, pole, second, gap", [
+    (2021, 12, 830, 847, 321),   # Spa en mojado: Verstappen, Russell a 0,321 en Q3
+    (2024, 1, 830, 844, 228),    # Baréin: Verstappen, Leclerc a 0,228 en Q3
+])
+def test_gap_to_pole_in_known_rounds(year, round_, pole, second, gap):
+    index = QualifyingIndex(read_csv_typed("qualifying", RUTA_DATOS), read_csv_typed("races", RUTA_DATOS))
+    season = index.season(year)
+    rows = season.rounds == round_
+    gaps = dict(zip(season.driver_ids[rows].tolist(), season.gap_to_pole()[rows].tolist()))
+    positions = dict(zip(season.driver_ids[rows].tolist(), season.positions[rows].tolist()))
+    assert positions[pole] == 1 and gaps[pole] == 0
+    assert positions[second] == 2 and gaps[second] == gap
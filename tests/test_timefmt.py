@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from timefmt import format_milliseconds, parse_time, parse_time_ms
+
+CASES = [
+    # Formatos de los CSV
+    ("1:34:50.616", 5690616),
+    ("1:27.452", 87452),
+    ("+5.478", 5478),
+    ("+66.7", 66700),
+    ("+1:05.123", 65123),
+    ("59.999", 59999),
+    ("12", 12000),
+    ("1:2.3", 62300),
+    # Nulos y textos no reconocidos
+    (None, None),
+    (np.nan, None),
+    ("", None),
+    ("\\N", None),
+    ("+1 Lap", None),
+    ("DNF", None),
+    # Campos vacíos
+    ("1:", None),
+    (":5", None),
+    (".5", None),
+    ("5.", None),
+    ("1::05.000", None),
+    # Segundos o minutos de 60 o más con un campo mayor a su izquierda
+    ("1:60.000", None),
+    ("1:60:00.000", None),
+    # Más de tres cifras decimales
+    ("12.3456", None),
+    ("+1:05.0421", None),
+    # Separadores mal colocados y demasiados campos
+    ("1.2:03", None),
+    ("1.2.3", None),
+    ("1:02:03:04", None),
+    ("1+2", None),
+    ("++1", None),
+    (" 1:02.000", None),
+]
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_parse_time_ms_matches_regex_reference(text, expected):
+    parsed = parse_time_ms([text])[0]
+    reference = parse_time(text)
+    if expected is None:
+        assert np.isnan(parsed) and np.isnan(reference)
+    else:
+        assert parsed == reference == expected
+
+
+def test_parse_time_ms_mixed_widths():
+    texts = [text for text, _ in CASES]
+    parsed = parse_time_ms(texts)
+    reference = np.array([parse_time(text) for text in texts])
+    np.testing.assert_array_equal(parsed, reference)
+
+
+def test_format_milliseconds_round_trip():
+    milliseconds = np.array([0, 59999, 87452, 600000, 5690616])
+    formatted = format_milliseconds(milliseconds)
+    assert list(formatted) == ["0:00,000", "0:59,999", "1:27,452", "10:00,000", "94:50,616"]
+    np.testing.assert_array_equal(parse_time_ms([text.replace(",", ".") for text in formatted]), milliseconds)
+
+
+def test_format_milliseconds_invalid_is_none():
+    assert list(format_milliseconds([np.nan, -1])) == [None, None]
@@ -0,0 +1,132 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Conversión vectorizada entre milisegundos y textos de tiempo ("m:ss,mmm"
+# para mostrar; "h:mm:ss.mmm", "m:ss.mmm", "+s.mmm" al leer los CSV). Los
+# dígitos se calculan con aritmética entera de NumPy y se ensamblan como una
+# matriz de bytes ASCII, sin llamadas Python por fila.
+
+_ZERO = ord("0")
+_DIGIT = np.zeros(256, dtype=bool)
+_DIGIT[_ZERO:_ZERO + 10] = True
+# Caracteres admitidos al leer: dígitos, separadores, "+" y el relleno de la
+# matriz de bytes
+_INVALID = ~_DIGIT
+for _char in b".:+\x00":
+    _INVALID[_char] = False
+_FIELD_UNITS = np.array([1000, 60000, 3600000, 0], dtype=np.int64)
+
+
+def format_milliseconds(milliseconds):
+    ms = np.asarray(milliseconds, dtype="float64")
+    valid = np.isfinite(ms) & (ms >= 0)
+    total = np.where(valid, ms, 0).astype(np.int64)
+    minutes, rest = np.divmod(total, 60000)
+    seconds, millis = np.divmod(rest, 1000)
+
+    out = np.full(total.shape, None, dtype=object)
+    # Los minutos tienen ancho variable: se ensambla una matriz por ancho
+    widths = 1 + sum((minutes >= 10 ** i).astype(np.int64) for i in range(1, 6))
+    for width in np.unique(widths[valid]):
+        rows = np.flatnonzero(valid & (widths == width))
+        chars = np.empty((len(rows), width + 7), dtype=np.uint8)
+        row_minutes = minutes[rows]
+        for i in range(width):
+            chars[:, width - 1 - i] = _ZERO + (row_minutes // 10 ** i) % 10
+        chars[:, width] = ord(":")
+        chars[:, width + 1] = _ZERO + seconds[rows] // 10
+        chars[:, width + 2] = _ZERO + seconds[rows] % 10
+        chars[:, width + 3] = ord(",")
+        chars[:, width + 4] = _ZERO + millis[rows] // 100
+        chars[:, width + 5] = _ZERO + (millis[rows] // 10) % 10
+        chars[:, width + 6] = _ZERO + millis[rows] % 10
+        out[rows] = chars.view(f"S{width + 7}").ravel().astype(str)
+    return out
+
+
+# Versión escalar de referencia de parse_time_ms, con una expresión regular
+_TIME = re.compile(r"\+?(?:(?:(\d+):)?(\d+):)?(\d+)(?:\.(\d{1,3}))?", re.ASCII)
+
+
+def parse_time(text):
+    if not isinstance(text, str):
+        return np.nan
+    match = _TIME.fullmatch(text)
+    if match is None:
+        return np.nan
+    hours, minutes, seconds, fraction = match.groups()
+    # Con minutos (u horas) a la izquierda, los segundos (o minutos) no llegan a 60
+    if (minutes is not None and int(seconds) >= 60) or (hours is not None and int(minutes) >= 60):
+        return np.nan
+    return ((int(hours or 0) * 60 + int(minutes or 0)) * 60 + int(seconds)) * 1000 + int((fraction or "").ljust(3, "0"))
+
+
+def parse_time_ms(values):
+    # Devuelve float64 con NaN para los valores nulos o no reconocidos (por
+    # ejemplo "\\N" o "+1 Lap"). Un "+" inicial (diferencia con el ganador) se
+    # ignora: "+5.478" -> 5478. Como parse_time, también son NaN los campos
+    # vacíos ("1:", ":5", ".5"), los segundos o minutos de 60 o más con un campo
+    # mayor a su izquierda ("1:60.000") y las fracciones de más de tres cifras.
+    strings = np.asarray(values, dtype=object)
+    missing = pd.isna(strings)
+    if missing.any():
+        strings = strings.copy()
+        strings[missing] = ""
+    raw = strings.astype("S")
+    n, width = len(raw), raw.dtype.itemsize
+    result = np.full(n, np.nan)
+    if n == 0 or width == 0:
+        return result
+
+    # Una fila por posición del texto (contigua) y una columna por valor
+    chars = np.ascontiguousarray(raw.view(np.uint8).reshape(n, width).T)
+    is_digit = _DIGIT[chars]
+    is_dot = chars == ord(".")
+    is_colon = chars == ord(":")
+    digit_values = (chars.astype(np.int64) - _ZERO) * is_digit
+    multipliers = np.where(is_digit, 10, 1)
+    separator_positions = (is_dot | is_colon).any(axis=1)
+
+    total = np.zeros(n, dtype=np.int64)
+    current = np.zeros(n, dtype=np.int64)
+    place = np.ones(n, dtype=np.int64)
+    field = np.zeros(n, dtype=np.int64)
+    seen_separator = np.zeros(n, dtype=bool)
+    # El "+" sólo puede ir al principio
+    malformed = (chars[1:] == ord("+")).any(axis=0)
+    # De derecha a izquierda: se acumula el campo actual y, al llegar a un
+    # separador, se suma con su unidad (fracción, segundos, minutos, horas).
+    # place es 10 ** (cifras del campo actual)
+    for pos in range(width - 1, -1, -1):
+        current += digit_values[pos] * place
+        place *= multipliers[pos]
+        if not separator_positions[pos]:
+            continue
+        rows = np.flatnonzero(is_dot[pos] | is_colon[pos])
+        dot = is_dot[pos, rows]
+        malformed[rows] |= (
+            (place[rows] == 1)
+            # El punto decimal sólo puede ser el primer separador por la
+            # derecha y lleva de una a tres cifras
+            | (dot & (seen_separator[rows] | (place[rows] > 1000)))
+            # A la derecha de ":" hay segundos o minutos
+            | (~dot & (current[rows] >= 60))
+        )
+        seen_separator[rows] = True
+        total[rows] += np.where(
+            dot,
+            current[rows] * 1000 // place[rows],
+            current[rows] * _FIELD_UNITS[np.minimum(field[rows], 3)],
+        )
+        field[rows] += ~dot
+        current[rows] = 0
+        place[rows] = 1
+    total += current * _FIELD_UNITS[np.minimum(field, 3)]
+    malformed |= place == 1
+
+    ok = ~_INVALID[chars].any(axis=0) & ~missing & ~malformed & (field < 3)
+    result[ok] = total[ok]
+    return result
@@ -0,0 +1,77 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import os
+import time
+
+# Precalcula todas las figuras de todas las temporadas (y cada valor de los
+# demás selectores: circuito en mejores vueltas, vista en clasificación) y las guarda en la caché de figuras en disco,
+# para que tras un despliegue ningún usuario pague el cálculo en frío.
+#
+#   python warmup.py --workers 4
+
+
+def warm_year(year):
+    import app
+    from data_store import MissingTableError
+
+    timings = []
+    for graph_id, callback, inputs in app.GRAPH_CALLBACKS:
+        cached = app.cached_figure(graph_id, callback, inputs)
+        for values in itertools.product(*(app.INPUT_CHOICES[i](year) for i in inputs)):
+            inicio = time.perf_counter()
+            try:
+                cached(year, *values)
+                status = "ok"
+            except MissingTableError as error:
+                status = f"sin datos ({error.name})"
+            timings.append({
+                "graph": graph_id,
+                "year": int(year),
+                "inputs": dict(zip(inputs, values)),
+                "ms": (time.perf_counter() - inicio) * 1000,
+                "status": status,
+            })
+    return timings
+
+
+def report(timings):
+    by_graph = {}
+    for timing in timings:
+        by_graph.setdefault(timing["graph"], []).append(timing)
+    print(f"{'gráfico':<28}{'figuras':>8}{'total ms':>11}{'media ms':>10}{'máx ms':>10}  sin datos")
+    for graph_id, rows in by_graph.items():
+        ms = [row["ms"] for row in rows]
+        missing = sum(row["status"] != "ok" for row in rows)
+        print(f"{graph_id:<28}{len(rows):>8}{sum(ms):>11.0f}{sum(ms) / len(ms):>10.1f}{max(ms):>10.1f}  {missing}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula las figuras de todas las temporadas en la caché en disco")
+    parser.add_argument("--cache-dir", default=os.environ.get("F1_FIGURE_CACHE_DIR", "./data/.figures"),
+                        help="Directorio de la caché de figuras compartida (F1_FIGURE_CACHE_DIR)")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos en paralelo")
+    parser.add_argument("--years", type=int, nargs="*", help="Temporadas a precalcular (por defecto todas)")
+    parser.add_argument("--json", help="Guardar los tiempos por figura en este fichero JSON")
+    args = parser.parse_args()
+
+    # La caché se configura antes de importar app para que los procesos del
+    # pool hereden el mismo directorio
+    os.environ["F1_FIGURE_CACHE_DIR"] = args.cache_dir
+    import app
+
+    years = args.years or [option["value"] for option in app.serve_layout()["year-selector"].options]
+
+    inicio = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            timings = [timing for year_timings in pool.map(warm_year, years) for timing in year_timings]
+    else:
+        timings = [timing for year in years for timing in warm_year(year)]
+
+    report(timings)
+    print(f"{len(timings)} figuras de {len(years)} temporadas en {time.perf_counter() - inicio:.1f}s -> {args.cache_dir}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(timings, f, indent=2)
@@ -1,7 +1,22 @@
-from app import app  # Importa la instancia de la aplicación Dash
+import os
+
+from app import app, preload, registry  # Importa la instancia de la aplicación Dash
+from static_bundles import StaticBundles, serve_static_bundles
 
 # Dash usa Flask internamente, así que exponemos su servidor subyacente
 server = app.server
 
+# Con gunicorn --preload este módulo se importa en el proceso maestro: las
+# tablas se construyen una sola vez y los workers las heredan al hacer fork
+if os.environ.get("F1_PRELOAD", "0") == "1":
+    preload()
+
+# Modo estático: las figuras exportadas con export.py se sirven desde sus
+# ficheros; las entradas no exportadas (o todas, si los datos cambian después
+# de la exportación) siguen con los callbacks en vivo
+if os.environ.get("F1_STATIC_DIR"):
+    serve_static_bundles(server, StaticBundles(os.environ["F1_STATIC_DIR"]),
+                         lambda: registry.get("figure_cache").version)
+
 if __name__ == "__main__":
     app.run_server(debug=True)